@@ -0,0 +1,305 @@
+"""
+Bitboard core for the GameState.
+* Every square is a bit of a 64 bits integer. The square (y, x) is the bit y*8 + x, the same order as the board list view and the chessEval tables
+* There's a bitboard for every piece ("wp", "bN"...) plus the occupancy of every player
+* It isn't faster than GameState: since the mailbox generator finds the checks and the pins from the king (see
+GameState.calc_legal_moves), the perft of both gets about the same nodes per second (python chessPerft.py --suite, with and
+without --mailbox). So GameState is the default of main.py and chessUCI, and this class is an alternative representation
+checked against it by test_chessRules and test_chessPerft
+"""
+from chessRules import GameState, Move
+
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+FULL = (1 << 64) - 1
+
+
+def leaper_attacks(jumps):
+    """
+    It returns a list with the squares attacked from every square by a piece that jumps (knight, king, pawn)
+    """
+    attacks = []
+    for y in range(8):
+        for x in range(8):
+            bb = 0
+            for dy, dx in jumps:
+                if 0 <= y+dy <= 7 and 0 <= x+dx <= 7:
+                    bb |= 1 << ((y+dy)*8 + x+dx)
+            attacks.append(bb)
+    return attacks
+
+def ray(dy, dx):
+    """
+    It returns a list with the squares reached from every square going in the direction (dy, dx) over an empty board
+    """
+    rays = []
+    for y in range(8):
+        for x in range(8):
+            bb = 0
+            i, j = y+dy, x+dx
+            while 0 <= i <= 7 and 0 <= j <= 7:
+                bb |= 1 << (i*8 + j)
+                i, j = i+dy, j+dx
+            rays.append(bb)
+    return rays
+
+
+KNIGHT_ATTACKS = leaper_attacks(((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1)))
+KING_ATTACKS = leaper_attacks(((1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)))
+PAWN_ATTACKS = {"w": leaper_attacks(((-1, 1), (-1, -1))), "b": leaper_attacks(((1, 1), (1, -1)))}
+
+# The rays that go to a higher bit (the first blocker is the lowest bit) and the ones that go to a lower bit (the first blocker is the highest bit)
+ROOK_RAYS_UP = (ray(1, 0), ray(0, 1))
+ROOK_RAYS_DOWN = (ray(-1, 0), ray(0, -1))
+BISHOP_RAYS_UP = (ray(1, 1), ray(1, -1))
+BISHOP_RAYS_DOWN = (ray(-1, -1), ray(-1, 1))
+
+# Every square that shares a row or column (rook lines) or a diagonal (bishop lines) with the square
+ROOK_LINES = [ROOK_RAYS_UP[0][sq] | ROOK_RAYS_UP[1][sq] | ROOK_RAYS_DOWN[0][sq] | ROOK_RAYS_DOWN[1][sq] for sq in range(64)]
+BISHOP_LINES = [BISHOP_RAYS_UP[0][sq] | BISHOP_RAYS_UP[1][sq] | BISHOP_RAYS_DOWN[0][sq] | BISHOP_RAYS_DOWN[1][sq] for sq in range(64)]
+
+# (player, side) -> Squares that must be empty to castle
+CASTLING_SQUARES = {("w", "l"): ((7, 1), (7, 2), (7, 3)), ("w", "r"): ((7, 5), (7, 6)),
+                    ("b", "l"): ((0, 1), (0, 2), (0, 3)), ("b", "r"): ((0, 5), (0, 6))}
+# (player, side) -> Squares the king passes through, they can't be attacked
+CASTLING_SAFE = {("w", "l"): ((7, 3), (7, 2)), ("w", "r"): ((7, 5), (7, 6)),
+                 ("b", "l"): ((0, 3), (0, 2)), ("b", "r"): ((0, 5), (0, 6))}
+
+
+def rook_attacks(sq, occ):
+    """
+    It returns the squares attacked by a rook in 'sq' with the occupancy 'occ'
+    """
+    attacks = 0
+    for rays in ROOK_RAYS_UP:
+        r = rays[sq]
+        blockers = r & occ
+        if blockers:
+            r ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= r
+    for rays in ROOK_RAYS_DOWN:
+        r = rays[sq]
+        blockers = r & occ
+        if blockers:
+            r ^= rays[blockers.bit_length() - 1]
+        attacks |= r
+    return attacks
+
+def bishop_attacks(sq, occ):
+    """
+    It returns the squares attacked by a bishop in 'sq' with the occupancy 'occ'
+    """
+    attacks = 0
+    for rays in BISHOP_RAYS_UP:
+        r = rays[sq]
+        blockers = r & occ
+        if blockers:
+            r ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= r
+    for rays in BISHOP_RAYS_DOWN:
+        r = rays[sq]
+        blockers = r & occ
+        if blockers:
+            r ^= rays[blockers.bit_length() - 1]
+        attacks |= r
+    return attacks
+
+def squares(bb):
+    """
+    It yields the index of every bit set in the bitboard
+    """
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# The squares between two squares of the same line (empty if they don't share a line)
+BETWEEN = [[0] * 64 for _ in range(64)]
+for sq in range(64):
+    for rays in ROOK_RAYS_UP + ROOK_RAYS_DOWN + BISHOP_RAYS_UP + BISHOP_RAYS_DOWN:
+        for to in squares(rays[sq]):
+            BETWEEN[sq][to] = rays[sq] ^ rays[to] ^ (1 << to)
+
+
+class BitboardGameState(GameState):
+    def __init__(self):
+        """
+        A GameState whose moves are calculated with bitboards.
+        * self.board (the list view) is kept updated, so it can be used by the UI and the evaluation as usual
+        """
+        self.bitboards = dict.fromkeys(PIECES, 0)
+        self.occupancy = {"w": 0, "b": 0}
+
+        super().__init__()
+
+    def copy(self):
+        """
+        It returns a new game with the same position (see GameState.copy), with its own bitboards
+        """
+        game = super().copy()
+        game.bitboards = dict(self.bitboards)
+        game.occupancy = dict(self.occupancy)
+        return game
+
+    def set_square(self, y, x, piece):
+        """
+        It puts the piece in the square (y, x), updating the bitboards (and the list view through GameState)
+        """
+        bit = 1 << (y*8 + x)
+        old = self.board[y][x]
+        if old != "--":
+            self.bitboards[old] ^= bit
+            self.occupancy[old[0]] ^= bit
+        if piece != "--":
+            self.bitboards[piece] |= bit
+            self.occupancy[piece[0]] |= bit
+        super().set_square(y, x, piece)
+
+    def square_attacked(self, sq, c, occ, removed=0):
+        """
+        It checks if the player 'c' attacks the square 'sq' with the occupancy 'occ'
+        * removed: The squares whose pieces of 'c' doesn't count (because they have just been captured)
+        """
+        bb = self.bitboards
+        keep = ~removed
+        if KNIGHT_ATTACKS[sq] & bb[c+"N"] & keep:
+            return True
+        if PAWN_ATTACKS["b" if c=="w" else "w"][sq] & bb[c+"p"] & keep:
+            return True
+        if KING_ATTACKS[sq] & bb[c+"K"]:
+            return True
+        rooks = (bb[c+"R"] | bb[c+"Q"]) & keep
+        if rooks and rook_attacks(sq, occ) & rooks:
+            return True
+        bishops = (bb[c+"B"] | bb[c+"Q"]) & keep
+        if bishops and bishop_attacks(sq, occ) & bishops:
+            return True
+        return False
+
+    def is_square_attacked(self, square, by_colour, ignored=None):
+        """
+        It checks if a piece of the player 'by_colour' attacks the square (y, x) (see GameState.is_square_attacked), with the bitboards
+        """
+        occ = self.occupancy["w"] | self.occupancy["b"]
+        if ignored is not None:
+            occ &= ~(1 << (ignored[0]*8 + ignored[1]))
+        return self.square_attacked(square[0]*8 + square[1], by_colour, occ)
+
+    def pinned_pieces(self, king_sq, p, c, occ):
+        """
+        It returns the pieces of the player 'p' that can't leave the line between their king and an attacker of 'c'
+        """
+        bb = self.bitboards
+        pinned = 0
+        attackers = (ROOK_LINES[king_sq] & (bb[c+"R"] | bb[c+"Q"])) | (BISHOP_LINES[king_sq] & (bb[c+"B"] | bb[c+"Q"]))
+        for sq in squares(attackers):
+            between = BETWEEN[king_sq][sq] & occ
+            # Only one piece between them, and it's of the player
+            if between and not between & (between - 1) and between & self.occupancy[p]:
+                pinned |= between
+        return pinned
+
+    def calc_legal_moves(self):
+        """
+        * It calculates the legal moves of the current player (self.isWhiteTurn) using the bitboards
+        * It stores the value in the list self.legal_moves
+        """
+        p = "w" if self.isWhiteTurn else "b"
+        c = "b" if p == "w" else "w"
+        bb = self.bitboards
+        board = self.board
+        own = self.occupancy[p]
+        enemy = self.occupancy[c]
+        occ = own | enemy
+
+        king_sq = bb[p+"K"].bit_length() - 1
+        self.theresCheck = self.square_attacked(king_sq, c, occ)
+
+        # The moves of the pieces to test: all of them if there's check, the pinned ones if not
+        to_test = FULL if self.theresCheck else self.pinned_pieces(king_sq, p, c, occ)
+
+        legal_moves = []
+        pseudo_moves = []
+
+        dirs = -8 if p == "w" else 8
+        pos_0 = 6 if p == "w" else 1
+        for sq in squares(bb[p+"p"]):
+            y, x = sq >> 3, sq & 7
+            moves = pseudo_moves if (to_test >> sq) & 1 else legal_moves
+            to = sq + dirs
+            if not (occ >> to) & 1:
+                moves.append(Move(y, x, y + dirs//8, x, p+"p"))
+                if y == pos_0 and not (occ >> (to + dirs)) & 1:
+                    moves.append(Move(y, x, y + dirs//4, x, p+"p"))
+            for to in squares(PAWN_ATTACKS[p][sq] & enemy):
+                moves.append(Move(y, x, to >> 3, to & 7, p+"p", board[to >> 3][to & 7]))
+
+        for sq in squares(bb[p+"N"]):
+            y, x = sq >> 3, sq & 7
+            moves = pseudo_moves if (to_test >> sq) & 1 else legal_moves
+            for to in squares(KNIGHT_ATTACKS[sq] & ~own):
+                moves.append(Move(y, x, to >> 3, to & 7, p+"N", board[to >> 3][to & 7]))
+
+        for piece in (p+"B", p+"R", p+"Q"):
+            for sq in squares(bb[piece]):
+                y, x = sq >> 3, sq & 7
+                moves = pseudo_moves if (to_test >> sq) & 1 else legal_moves
+                if piece[1] == "B":
+                    attacks = bishop_attacks(sq, occ)
+                elif piece[1] == "R":
+                    attacks = rook_attacks(sq, occ)
+                else:
+                    attacks = rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+                for to in squares(attacks & ~own):
+                    moves.append(Move(y, x, to >> 3, to & 7, piece, board[to >> 3][to & 7]))
+
+        self.legal_moves = legal_moves
+
+        # Keep the moves to test that don't leave the king in check
+        for move in pseudo_moves:
+            to_bit = 1 << (move.y1*8 + move.x1)
+            if not self.square_attacked(king_sq, c, (occ ^ (1 << (move.y0*8 + move.x0))) | to_bit, to_bit):
+                self.legal_moves.append(move)
+
+        if self.enpassant_square:
+            ep_y, ep_x = self.enpassant_square
+            ep_sq = ep_y*8 + ep_x
+            capt_sq = ep_sq - dirs
+            for sq in squares(PAWN_ATTACKS[c][ep_sq] & bb[p+"p"]):
+                capt_bit = 1 << capt_sq
+                if not self.square_attacked(king_sq, c, (occ ^ (1 << sq) ^ capt_bit) | (1 << ep_sq), capt_bit):
+                    self.legal_moves.append(Move(sq >> 3, sq & 7, ep_y, ep_x, p+"p", paso=True))
+
+        # The king can't go to an attacked square (the king itself doesn't block the attacks)
+        ky, kx = king_sq >> 3, king_sq & 7
+        occ_no_king = occ ^ (1 << king_sq)
+        for to in squares(KING_ATTACKS[king_sq] & ~own):
+            to_bit = 1 << to
+            if not self.square_attacked(to, c, occ_no_king, to_bit):
+                self.legal_moves.append(Move(ky, kx, to >> 3, to & 7, p+"K", board[to >> 3][to & 7]))
+
+        self.legal_moves += self.bitboard_enroc(p, c, occ)
+
+        self.check_checkMate()
+        self.check_draw()
+
+    def bitboard_enroc(self, p, c, occ):
+        """
+        If possible, it returns the castle moves.
+        """
+        movements = []
+        if self.theresCheck:
+            return movements
+
+        y = 7 if p == "w" else 0
+        for side, counter, rook_x, king_x in (("l", self.w_l_enroc if p=="w" else self.b_l_enroc, 0, 2),
+                                              ("r", self.w_r_enroc if p=="w" else self.b_r_enroc, 7, 6)):
+            if counter != 0 or self.board[y][rook_x] != p+"R":
+                continue
+            if any((occ >> (i*8 + j)) & 1 for i, j in CASTLING_SQUARES[(p, side)]):
+                continue
+            if any(self.square_attacked(i*8 + j, c, occ) for i, j in CASTLING_SAFE[(p, side)]):
+                continue
+            movements.append(Move(y, 4, y, king_x, p+"K", enroc=side))
+
+        return movements
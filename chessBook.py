@@ -0,0 +1,251 @@
+"""
+Opening book: the moves played in a collection of games, by position, to play the openings without searching.
+* The book is a binary file of entries of 16 bytes sorted by key, as the Polyglot books: key (8), move (2), weight (2), learn (4),
+big-endian. The key is the Zobrist key of GameState and the move is Move.pack, so it isn't compatible with the Polyglot keys
+* It's opened with mmap and searched with binary search, so a probe reads only a few entries of the file
+* It's built from PGN files with build_book (or the command line: python chessBook.py build games.pgn -o book.bin)
+"""
+import argparse
+import mmap
+import random
+import re
+import struct
+from time import time
+
+from chessRules import GameState, Move
+from chessBitboard import BitboardGameState
+from chessPerft import move_name
+
+ENTRY = struct.Struct(">QHHI")
+ENTRY_BYTES = ENTRY.size
+MAX_WEIGHT = 0xffff
+
+# Points of a move for the weight of the book, by the result of the game for the player who made it (the games without
+# result count as a draw)
+RESULT_POINTS = {"win": 2, "draw": 1, "loss": 0}
+
+
+class OpeningBook():
+    def __init__(self, path:str):
+        """
+        Book file opened with mmap (see the format at the top of the module). It has to be closed with close()
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        self.file.seek(0, 2)
+        size = self.file.tell()
+        # mmap can't map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.entries = size // ENTRY_BYTES
+
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def first_entry(self, key:int):
+        """
+        Binary search: it returns the index of the first entry with 'key', or of the next key if there isn't
+        """
+        low, high = 0, self.entries
+        data = self.data
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from(">Q", data, middle * ENTRY_BYTES)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def probe(self, game:GameState):
+        """
+        It returns a list of (Move, weight) with the legal moves of the book in the position of 'game'
+        """
+        self.probes += 1
+        key = game.zobrist_key
+        moves = []
+        i = self.first_entry(key)
+        while i < self.entries:
+            entry_key, packed, weight, _ = ENTRY.unpack_from(self.data, i * ENTRY_BYTES)
+            if entry_key != key:
+                break
+            move = Move.unpack(packed, game)
+            # A key collision could give a move of another position
+            for legal in game.legal_moves:
+                if legal == move:
+                    moves.append((legal, weight))
+                    break
+            i += 1
+        if moves:
+            self.hits += 1
+        return moves
+
+    def choose(self, game:GameState, rng=random):
+        """
+        It returns a move of the book for the position of 'game' (chosen at random, with the probability of its weight),
+        or None if the position isn't in the book
+        """
+        moves = [(move, weight) for move, weight in self.probe(game) if weight > 0]
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+
+def read_pgn(path:str):
+    """
+    It yields every game of the PGN file as (tags dict, list of moves in SAN): https://www.chessprogramming.org/Portable_Game_Notation
+    * The comments, the variations, the NAGs and the numbers of the moves are removed
+    """
+    tags = {}
+    movetext = []
+
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                if movetext:
+                    yield tags, san_moves(" ".join(movetext))
+                    tags, movetext = {}, []
+                match = re.match(r'\[(\w+)\s+"(.*)"\]', line)
+                if match:
+                    tags[match.group(1)] = match.group(2)
+            elif line and not line.startswith("%"):
+                movetext.append(line)
+    if movetext or tags:
+        yield tags, san_moves(" ".join(movetext))
+
+
+def san_moves(movetext:str):
+    """
+    It returns the moves in SAN of the text of a game, without comments, variations, NAGs, numbers nor result
+    """
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", movetext)
+    # The variations can be nested
+    while True:
+        text, removed = re.subn(r"\([^()]*\)", " ", text)
+        if not removed:
+            break
+    moves = []
+    for token in text.split():
+        token = re.sub(r"^\d+\.+", "", token)
+        if not token or token.startswith("$") or token in ("1-0", "0-1", "1/2-1/2", "*"):
+            continue
+        moves.append(token)
+    return moves
+
+
+def find_san_move(game:GameState, san:str):
+    """
+    It returns the legal move of the position written in SAN (as "Nf3", "exd5", "O-O" or "e8=Q"), or None.
+    The promotions to other pieces than a queen aren't legal moves of GameState
+    """
+    san = san.rstrip("+#!?")
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        side = "r" if san in ("O-O", "0-0") else "l"
+        for move in game.legal_moves:
+            if move.enroc == side:
+                return move
+        return None
+
+    match = re.fullmatch(r"([NBRQK])?([a-h])?([1-8])?x?([a-h])([1-8])(?:=?([NBRQ]))?", san)
+    if not match:
+        return None
+    piece, from_file, from_rank, to_file, to_rank, promotion = match.groups()
+    if promotion and promotion != "Q":
+        return None
+
+    piece = piece or "p"
+    x1, y1 = "abcdefgh".index(to_file), 8 - int(to_rank)
+    found = None
+    for move in game.legal_moves:
+        if move.x1 != x1 or move.y1 != y1 or game.board[move.y0][move.x0][1] != piece:
+            continue
+        if from_file and move.x0 != "abcdefgh".index(from_file):
+            continue
+        if from_rank and move.y0 != 8 - int(from_rank):
+            continue
+        if found is not None:
+            return None # Ambiguous
+        found = move
+    return found
+
+
+def build_book(pgn_paths, book_path:str, max_plies=20, min_games=1, game_class=BitboardGameState):
+    """
+    It builds the book file with the first 'max_plies' moves of the games of the PGN files.
+    * The weight of a move is the sum of the points (RESULT_POINTS) of the games it was played in, for the player who made it
+    * The moves played in less than 'min_games' games aren't kept
+    * It returns a dict with the number of games, the games with a wrong move (they're kept up to it) and the entries
+    """
+    counts = {} # (key, packed move) -> [games, points]
+    games = 0
+    wrong_games = 0
+
+    for path in pgn_paths:
+        for tags, moves in read_pgn(path):
+            games += 1
+            result = tags.get("Result", "*")
+            game = game_class.from_fen(tags["FEN"]) if "FEN" in tags else game_class()
+            for san in moves[:max_plies]:
+                move = find_san_move(game, san)
+                if move is None:
+                    wrong_games += 1
+                    break
+                if result == "1/2-1/2" or result not in ("1-0", "0-1"):
+                    points = RESULT_POINTS["draw"]
+                elif (result == "1-0") == game.isWhiteTurn:
+                    points = RESULT_POINTS["win"]
+                else:
+                    points = RESULT_POINTS["loss"]
+
+                count = counts.setdefault((game.zobrist_key, move.pack()), [0, 0])
+                count[0] += 1
+                count[1] += points
+                game.makeMove(move)
+
+    entries = []
+    for (key, packed), (played, points) in counts.items():
+        if played >= min_games and points > 0:
+            entries.append((key, packed, min(points, MAX_WEIGHT)))
+    entries.sort()
+
+    with open(book_path, "wb") as file:
+        for key, packed, weight in entries:
+            file.write(ENTRY.pack(key, packed, weight, 0))
+
+    return {"games": games, "wrong_games": wrong_games, "entries": len(entries)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Opening book of the engine")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build a book from PGN files")
+    build.add_argument("pgn", nargs="+", help="PGN files")
+    build.add_argument("-o", "--output", default="book.bin", help="Book file")
+    build.add_argument("--plies", type=int, default=20, help="Moves of every game kept in the book")
+    build.add_argument("--min-games", type=int, default=1, help="Games needed to keep a move")
+
+    probe = subparsers.add_parser("probe", help="Print the moves of the book for a position")
+    probe.add_argument("book", help="Book file")
+    probe.add_argument("--fen", help="Position (the initial one by default)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        t0 = time()
+        stats = build_book(args.pgn, args.output, args.plies, args.min_games)
+        print("Games: {games} With wrong moves: {wrong_games} Entries: {entries}".format(**stats) + " Time: {:.2f} s".format(time() - t0))
+    else:
+        game = BitboardGameState.from_fen(args.fen) if args.fen else BitboardGameState()
+        book = OpeningBook(args.book)
+        t0 = time()
+        moves = book.probe(game)
+        elapsed = time() - t0
+        total = sum(weight for _, weight in moves)
+        for move, weight in sorted(moves, key=lambda item: -item[1]):
+            print("{} {:>6} {:.1%}".format(move_name(move), weight, weight / total if total else 0))
+        print("Probe time: {:.0f} us".format(elapsed * 1e6))
+        book.close()
@@ -1,20 +1,223 @@
 from time import time
-from copy import deepcopy
+from functools import wraps
+import os
 
 from numpy import array, where
 from random import choice
 
 import concurrent.futures
+import multiprocessing
 import background as bg
 
 from chessRules import GameState, Move
 from chessEval import GameEval
+from chessOrdering import MoveOrdering
+from chessBook import OpeningBook
+from chessTablebase import Tablebases
+from chessStats import SearchStats, engine_counters
+from chessProfiler import Profiler
+from chessTransposition import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER, encode_move, merge_stats
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time or the nodes of the search are over
+    """
+    pass
+
+
+# State of a worker process of the pool, kept from one task to the next (see worker_init)
+worker_engine = None
+worker_game = None
+worker_search = None
+worker_shared_tt = None
+worker_profiler = None
+worker_start_counters = None
+
+# Attributes of ChessEngine that change how it searches. They're sent to the worker processes with every task, so the
+# workers search as the main engine even if they're changed between searches (see ChessEngine.search_options)
+SEARCH_OPTIONS = ("quiescence_search", "q_node_limit", "q_delta", "null_move_pruning", "late_move_reductions", "futility_pruning",
+                  "null_move_reduction", "lmr_moves", "repetition_draws")
+
+
+def worker_init(game_class, tt_size_mb, split_window, tablebase_path=None, profile_dir=None):
+    """
+    It runs once in every worker process when the pool starts: the GameState, the engine and its transposition table
+    are created here and reused by all the tasks
+    * split_window is the memory shared with the main process to know the bounds of the node being split (see ChessEngine.ybwc)
+    * tablebase_path: Directory of the endgame tables of the main engine, every worker maps them too
+    * profile_dir: If it's given, the worker is profiled and saves its profile there after every task (see profiled_task)
+    """
+    global worker_engine, worker_game, worker_profiler
+    worker_game = game_class()
+    worker_engine = ChessEngine(worker_game, tt_size_mb, tablebase_path=tablebase_path)
+    worker_engine.split_window = split_window
+    worker_engine.profile_dir = profile_dir
+    if profile_dir is not None:
+        worker_profiler = Profiler()
+        worker_profiler.start()
+
+
+def profiled_task(task):
+    """
+    Decorator of the tasks of the workers: with a profiler, its profile is saved after the task as profile-<pid>.json
+    in the profile directory (see chessProfiler.load_profiles), so the main process can merge them at any moment
+    """
+    @wraps(task)
+    def profiled(*args):
+        try:
+            return task(*args)
+        finally:
+            if worker_profiler is not None:
+                worker_profiler.save(os.path.join(worker_engine.profile_dir, "profile-{}.json".format(os.getpid())))
+    return profiled
+
+
+def worker_new_search(search_id):
+    """
+    It prepares the transposition table of the worker the first time it gets a task of a search, and keeps its counters
+    at that moment: the tasks return what they've grown in the search (see chessStats.engine_counters)
+    """
+    global worker_search, worker_start_counters
+    if search_id != worker_search:
+        worker_search = search_id
+        worker_engine.tt.new_search()
+        worker_engine.tt.reset_stats()
+        worker_engine.reset_q_stats()
+        worker_engine.ordering.new_search()
+        worker_start_counters = engine_counters(worker_engine)
+
+
+def worker_set_options(options:dict):
+    """
+    It sets the switches of the search of the main engine (see SEARCH_OPTIONS) in the engine of the worker
+    """
+    for name, value in options.items():
+        setattr(worker_engine, name, value)
+
+
+@profiled_task
+def worker_search_move(search_id, position, move, depth, options):
+    """
+    Task of a worker process: it searches 'move' in 'position' (see GameState.get_position) up to 'depth', with the
+    switches of the main engine ('options', see SEARCH_OPTIONS).
+    It returns the evaluation, the pid of the worker, and the stats of its transposition table and its counters in the
+    current search
+    """
+    worker_new_search(search_id)
+    worker_set_options(options)
+
+    worker_game.set_position(position)
+    maximize = worker_game.isWhiteTurn
+
+    worker_game.makeMove(move)
+    game_eval = worker_engine.minimax(depth - 1, worker_game, -float("inf"), float("inf"), not maximize)
+    worker_game.undoMove()
+
+    return game_eval, os.getpid(), worker_engine.tt.stats(), engine_counters(worker_engine, worker_start_counters)
+
+
+@profiled_task
+def worker_search_split(search_id, split_id, position, move, depth, alpha, beta, options):
+    """
+    Task of a worker process in the Young Brothers Wait search: it searches 'move', a younger brother of the node being split.
+    * The window is the one of the split node when the task was sent, narrowed with the shared one when the task starts
+    * options: Switches of the search of the main engine (see SEARCH_OPTIONS)
+    * It returns (evaluation, pid, stats of the transposition table, counters in the current search), with None as evaluation
+    if the search was abandoned because the split node got a cutoff (or was finished) meanwhile
+    """
+    worker_new_search(search_id)
+    worker_set_options(options)
+    engine = worker_engine
+    window = engine.split_window
+
+    engine.split_id = split_id
+    if window[0] == split_id:
+        alpha, beta = max(alpha, window[1]), min(beta, window[2])
+    # The shared window is an array of floats: the finite bounds go back to integers, as the scores of the search
+    alpha = int(alpha) if abs(alpha) != float("inf") else alpha
+    beta = int(beta) if abs(beta) != float("inf") else beta
+    if engine.split_abandoned() or alpha >= beta:
+        return None, os.getpid(), engine.tt.stats(), engine_counters(engine, worker_start_counters)
+
+    worker_game.set_position(position)
+    maximize = worker_game.isWhiteTurn
+
+    worker_game.makeMove(move)
+    try:
+        game_eval = engine.minimax(depth - 1, worker_game, alpha, beta, not maximize)
+    except SearchTimeout:
+        game_eval = None
+    finally:
+        engine.split_id = None
+
+    return game_eval, os.getpid(), engine.tt.stats(), engine_counters(engine, worker_start_counters)
+
+
+@profiled_task
+def worker_lazy_smp(smp_id, helper, position, max_depth, tt_name, tt_size_mb, tt_age, options, time_limit=None):
+    """
+    Task of a worker process in the Lazy SMP search: it searches the position with iterative deepening using the shared
+    transposition table, so every worker profits from the work of the others.
+    * The odd helpers start one ply deeper, so the workers don't search the same depth at the same time
+    * It stops when the main process has got a result of max_depth, or when the time is over
+    * The shared table is opened the first time (with its name) and kept by the worker
+    * options: Switches of the search of the main engine (see SEARCH_OPTIONS)
+    It returns (depth, evaluation, best move) of its deepest search finished, the pid, the stats of the shared table and
+    the counters of the task
+    """
+    global worker_shared_tt
+    engine = worker_engine
+    if worker_shared_tt is None or worker_shared_tt.name != tt_name:
+        worker_shared_tt = SharedTranspositionTable(tt_size_mb, tt_name)
+    worker_shared_tt.age = tt_age
+    worker_shared_tt.reset_stats()
+    engine.ordering.new_search()
+    worker_set_options(options)
+
+    worker_game.set_position(position)
+    own_tt, engine.tt = engine.tt, worker_shared_tt
+    engine.split_id = smp_id
+    engine.nodes = 0
+    engine.deadline = time() + time_limit if time_limit is not None else float("inf")
+    start_counters = engine_counters(engine)
+
+    best = (0, 0, None)
+    try:
+        for depth in range(1 + helper % 2, max_depth + 1):
+            move, game_eval = engine.search_root(worker_game, depth, best[2])
+            best = (depth, game_eval, move)
+    except SearchTimeout:
+        pass
+    finally:
+        counters = engine_counters(engine, start_counters)
+        engine.tt = own_tt
+        engine.split_id = None
+        engine.deadline = float("inf")
+
+    return best, os.getpid(), worker_shared_tt.stats(), counters
+
 
 class ChessEngine():
-    def __init__(self, game:GameState):
+    def __init__(self, game:GameState, tt_size_mb=16, workers=None, parallel="root", search_mode="minimax", book_path=None,
+                 tablebase_path=None):
         """
         this module implement's Tomasz Michniewski's Simplified Evaluation Function
         https://www.chessprogramming.org/Simplified_Evaluation_Function
+        * tt_size_mb: Memory of the transposition table, in MB (every search process has its own table)
+        * workers: Processes of the pool used by minimax_root (by default, one for every CPU)
+        * parallel: How minimax_root uses the workers
+            * "root": every legal move is searched by a worker with the whole window
+            * "ybwc": Young Brothers Wait, the first move is searched before the others get its bound (see self.ybwc)
+            * "lazy_smp": all the workers search the whole position sharing one transposition table (see self.lazy_smp_root)
+        * search_mode: Algorithm of the iterative deepening (see self.search)
+            * "minimax": alpha-beta with the whole window (see self.minimax)
+            * "negamax": principal variation search with aspiration windows (see self.negamax). With this mode minimax_root
+            searches in this process with iterative deepening. It gets the evaluations of "minimax" with fewer nodes when the
+            quiescence search has no node limit and there isn't selective pruning (see self.quiescence)
+        * book_path: Opening book file (see chessBook). minimax_root plays its moves without searching
+        * tablebase_path: Directory of the endgame tables (see chessTablebase). Their positions aren't searched: minimax_root
+        plays the best move of the tables and minimax and negamax return their result
         """
         self.current_game = game
         self.predicted_game = game
@@ -42,12 +245,128 @@ class ChessEngine():
         self.alpha = -float("inf")
         self.beta = float("inf")
 
+        self.tt = TranspositionTable(tt_size_mb)
+        self.tt_stats = {}
+        self.tt_size_mb = tt_size_mb
+
+        # Pool of processes of the search, started the first time it's needed (see get_pool)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.searches = 0
+        self.parallel = parallel
+
+        # Young Brothers Wait: the nodes with less depth than split_depth aren't split.
+        # split_window is the shared memory with [id of the split node, alpha, beta], split_id the node searched by a worker
+        self.split_depth = 3
+        self.split_window = None
+        self.split_id = None
+        self.splits = 0
+        self.splits_cutoff = 0
+
+        # Lazy SMP: transposition table in shared memory, created the first time it's needed
+        self.shared_tt = None
+
+        # Opening book, probed before every search (see self.book_move)
+        self.book = OpeningBook(book_path) if book_path else None
+
+        # Endgame tables, probed at the root (see self.tablebase_move) and in every node with few pieces (see self.tablebase_score)
+        self.tablebase_path = tablebase_path
+        self.tablebases = Tablebases(tablebase_path) if tablebase_path else None
+
+        # Limits of the search (see self.search)
+        self.nodes = 0
+        self.node_limit = float("inf")
+        self.deadline = float("inf")
+
+        # Quiescence search at the leaves (see self.quiescence). q_node_limit is the limit of nodes of every leaf
+        self.quiescence_search = True
+        self.q_node_limit = 64
+        self.q_delta = 200 # Margin of the delta pruning
+        self.q_stats = {}
+        self.reset_q_stats()
+
+        # Order of the moves in minimax: hash move, captures, killers and history (see chessOrdering)
+        self.ordering = MoveOrdering()
+
+        # Negamax: window of the first aspiration search around the evaluation of the previous depth (from aspiration_depth,
+        # the evaluations of the first depths change too much), and researches done
+        self.search_mode = search_mode
+        self.aspiration_delta = 100
+        self.aspiration_depth = 4
+        self.aspiration_researches = 0
+        self.pvs_researches = 0
+
+        # Selective pruning of minimax and negamax (see self.pruning): switches, reduction of the null move,
+        # moves searched before the late move reductions, and counters
+        self.null_move_pruning = True
+        self.late_move_reductions = True
+        self.futility_pruning = True
+        self.null_move_reduction = 2
+        self.lmr_moves = 3
+        self.pruning_stats = {}
+        self.reset_pruning_stats()
+
+        # A position of the search that was already reached (in the search or in the game) is a draw: the same moves could be
+        # repeated until the threefold repetition (see GameState.repetitions)
+        self.repetition_draws = True
+
+        # Statistics of every search by depth (see chessStats), None to not collect them. search_stats is the summary of the
+        # last search of minimax_root, and workers_counters the counters of its worker processes (by pid, or by helper in Lazy SMP)
+        self.stats = None
+        self.search_stats = None
+        self.workers_counters = {}
+
+        # Directory where the worker processes save their profiles (see chessProfiler), None to not profile them.
+        # It's given to the workers when the pool starts
+        self.profile_dir = None
+
     @bg.task
-    def minimax_root(self, depth:int, game:GameState):
+    def minimax_root(self, depth:int, game:GameState, time_limit=None, node_limit=None, info=None):
         """
         What is the highest value move per our evaluation function?
         * White always wants to maximize (and black to minimize)
         * the board score according to evaluate_board()
+        * With a time_limit (seconds) or a node_limit, it searches with iterative deepening up to 'depth' (see self.search)
+        * If the position is in the opening book or in the endgame tables, its move is played without searching
+        * With self.stats, the summary of the search is kept in self.search_stats whatever the mode, with the counters of
+        the worker processes in the parallel searches
+        * info: Function called with (depth, evaluation, best move, seconds) after every depth of the iterative deepening,
+        or at the end of the parallel searches
+        """
+        self.search_stats = None
+        move = self.book_move(game) or self.tablebase_move(game)
+        if move is not None:
+            self.bestMove, self.pos_evaluation = move, self.gameEval.eval_pos(game)
+            self.finishedPrediction = True
+            return
+
+        self.finishedPrediction = False
+        if self.parallel != "lazy_smp" and (time_limit is not None or node_limit is not None or self.search_mode == "negamax"):
+            self.bestMove, self.pos_evaluation, _, self.search_stats = self.search(game, depth, time_limit, node_limit, info)
+            self.finishedPrediction = True
+            return
+
+        t0 = time()
+        if self.stats is not None:
+            self.stats.start(self)
+        details = None
+        if self.parallel == "lazy_smp":
+            self.bestMove, self.pos_evaluation, depth = self.lazy_smp_root(depth, game, time_limit)
+        elif self.parallel == "ybwc":
+            self.bestMove, self.pos_evaluation = self.ybwc_root(depth, game)
+            details = {"splits": self.splits, "splits_cutoff": self.splits_cutoff}
+        else:
+            self.bestMove, self.pos_evaluation = self.parallel_root(depth, game)
+        if self.stats is not None:
+            self.search_stats = self.stats.finish(self, self.bestMove, self.pos_evaluation, depth, self.workers_counters.values(), details)
+        if info is not None:
+            info(depth, self.pos_evaluation, self.bestMove, time() - t0)
+        self.finishedPrediction = True
+
+    def parallel_root(self, depth:int, game:GameState):
+        """
+        Every legal move of the position is searched by a worker with the whole window (see worker_search_move).
+        It returns the best move and its evaluation (one of the best ones at random)
         """
         self.moves_predicted = []
         self.moves_predicted_evaluation = []
@@ -56,38 +375,38 @@ class ChessEngine():
         self.game = game
         self.maximize = game.isWhiteTurn
 
-        self.finishedPrediction = False
         self.continue_calculing = True
 
         maximize = game.isWhiteTurn
         best_move = -float("inf") if maximize else float("inf")
 
         #moves = get_ordered_moves(board)
-        game = deepcopy(game)
         moves = game.legal_moves
         best_move_found = moves[0]
 
         self.max_games = len(game.legal_moves) # To show in the UI
         self.current_eval_game = -1
 
-        t0 = time()
-        
-        ''' with concurrent.futures.ProcessPoolExecutor(max_workers=len(game.legal_moves)) as executor:
-            results = executor.map(self.minimax_multiprocess_root, game.legal_moves)
-            for result in results:
-                self.moves_predicted.append(result[1])
-                self.moves_predicted_evaluation.append(result[0]) '''
-        with concurrent.futures.ProcessPoolExecutor(max_workers=len(game.legal_moves)) as executor:
-            futures = [executor.submit(self.minimax_multiprocess_root, legal_move) for legal_move in game.legal_moves]
-            # iterate over all submitted tasks and get results as they are available
-            for future in concurrent.futures.as_completed(futures):
-                # get the result for the next completed task
-                result = future.result() # blocks
-                self.moves_predicted.append(result[1])
-                self.moves_predicted_evaluation.append(result[0])
-        print("Total time: " + str(time() - t0))
+        self.searches += 1
+        self.workers_counters = {}
+        position = game.get_position()
+        workers_tt_stats = {}
+
+        executor = self.get_pool(game)
+        options = self.search_options()
+        futures = {executor.submit(worker_search_move, self.searches, position, legal_move, depth, options): legal_move for legal_move in moves}
+        # iterate over all submitted tasks and get results as they are available
+        for future in concurrent.futures.as_completed(futures):
+            # get the result for the next completed task
+            game_eval, pid, tt_stats, counters = future.result() # blocks
+            self.moves_predicted.append(futures[future])
+            self.moves_predicted_evaluation.append(game_eval)
+            # The last stats of every worker are the ones of the whole search
+            workers_tt_stats[pid] = tt_stats
+            self.workers_counters[pid] = counters
+
+        self.tt_stats = merge_stats(workers_tt_stats.values())
 
-        print(self.moves_predicted_evaluation)
         if maximize:
             best_move = max(self.moves_predicted_evaluation)
             arr = array(self.moves_predicted_evaluation)
@@ -100,84 +419,793 @@ class ChessEngine():
             best_move_i = choice(where(arr == best_move)[0])
             best_move_found = self.moves_predicted[best_move_i]
 
+        return best_move_found, best_move
 
-        self.bestMove = best_move_found
-        self.pos_evaluation = best_move
+    def book_move(self, game:GameState):
+        """
+        It returns a move of the opening book for the position (see OpeningBook.choose), or None if there isn't a book or
+        the position isn't in it
+        """
+        if self.book is None:
+            return None
+        return self.book.choose(game)
 
-        self.finishedPrediction = True
+    def tablebase_score(self, game:GameState):
+        """
+        It returns the score of the endgame tables for the player to move (as negamax), or None if the position isn't in them.
+        The mates are scored as the mates found by the search: MATE_SCORE less the plies to the mate
+        """
+        if self.tablebases is None or len(game.piece_squares["w"]) + len(game.piece_squares["b"]) > self.tablebases.max_pieces:
+            return None
+        result = self.tablebases.probe(game)
+        if result is None:
+            return None
+        outcome, plies = result
+        return outcome * (self.MATE_SCORE - plies) if outcome else 0
 
-    def minimax_multiprocess_root(self, move):
-        game = deepcopy(self.game)
-        game.makeMove(move)
-        # Checking if draw can be claimed at this level, because the threefold repetition check
-        # can be expensive. This should help the bot avoid a draw if it's not favorable
-        # https://python-chess.readthedocs.io/en/latest/core.html#chess.Board.can_claim_draw
-        ''' if board.can_claim_draw():
-            game_eval = 0.0
-        else: '''
-        t0 = time()
-        game_eval = self.minimax(self.depth - 1, game, -float("inf"), float("inf"), not self.maximize)
+    def tablebase_move(self, game:GameState):
+        """
+        It returns the best move of the endgame tables: the fastest mate when winning, the slowest one when losing, or a
+        move keeping the draw. None if there aren't tables or any move goes out of them
+        * The moves are tried in a copy of the game (the GUI reads the game meanwhile) and without calculating the legal
+        moves: the mates and the stalemates are in the tables, and the captures of the last piece are draws
+        """
+        if self.tablebases is None or not game.legal_moves or self.tablebase_score(game) is None:
+            return None
+        game = game.copy()
+        best_move, best_score = None, None
+        for move in game.legal_moves:
+            game.makeMove(move, flag=False)
+            if game.insufficient_material:
+                score = 0
+            else:
+                score = self.tablebase_score(game)
+                score = -score if score is not None else None
+            game.undoMove(flag=False)
+            if score is None:
+                return None
+            if best_score is None or score > best_score:
+                best_move, best_score = move, score
+        return best_move
+
+    def get_pool(self, game:GameState):
+        """
+        It returns the pool of worker processes, starting it the first time.
+        * The workers keep their engine and transposition table between searches, so the start is paid only once
+        * The switches of the search are given to the workers with every task (see self.search_options)
+        """
+        if self.pool is None:
+            self.split_window = multiprocessing.Array("d", [-1, -float("inf"), float("inf")], lock=False)
+            self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=worker_init,
+                                                               initargs=(type(game), self.tt_size_mb, self.split_window, self.tablebase_path,
+                                                                         self.profile_dir))
+        return self.pool
+
+    def search_options(self):
+        """
+        The switches of the search (see SEARCH_OPTIONS) for the tasks of the worker processes
+        """
+        return {name: getattr(self, name) for name in SEARCH_OPTIONS}
+
+    def close(self):
+        """
+        It stops the worker processes, frees the shared transposition table and closes the opening book and the endgame tables
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.shared_tt is not None:
+            self.shared_tt.close()
+            self.shared_tt = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.tablebases is not None:
+            self.tablebases.close()
+            self.tablebases = None
+
+    def lazy_smp_root(self, depth:int, game:GameState, time_limit=None):
+        """
+        Lazy SMP: https://www.chessprogramming.org/Lazy_SMP
+        * Every worker searches the position with iterative deepening (see worker_lazy_smp), sharing the transposition table
+        * When a worker finishes 'depth' (or the time is over) the others stop, and the deepest result is taken
+        It returns the best move, its evaluation and the depth
+        """
+        self.searches += 1
+        self.workers_counters = {}
+        self.get_pool(game)
+        if self.shared_tt is None:
+            self.shared_tt = SharedTranspositionTable(self.tt_size_mb)
+        self.shared_tt.new_search()
+
+        smp_id = 1000 * self.searches
+        window = self.split_window
+        window[1], window[2] = -float("inf"), float("inf")
+        window[0] = smp_id
+
+        position = game.get_position()
+        tt = self.shared_tt
+        options = self.search_options()
+        futures = {self.pool.submit(worker_lazy_smp, smp_id, helper, position, depth, tt.name, tt.size_mb, tt.age, options, time_limit): helper
+                   for helper in range(self.workers)}
+        best = (0, 0, None)
+        workers_tt_stats = []
+        for future in concurrent.futures.as_completed(futures):
+            result, pid, tt_stats, counters = future.result()
+            workers_tt_stats.append(tt_stats)
+            self.workers_counters[futures[future]] = counters
+            if result[0] > best[0]:
+                best = result
+            if result[0] >= depth:
+                # The rest of the workers stop
+                window[0] = -1
+        window[0] = -1
+
+        self.tt_stats = merge_stats(workers_tt_stats)
+        # All the workers used the same entries
+        self.tt_stats["entries"] = 2 * tt.buckets
+        self.tt_stats["fill_rate"] = min(1.0, self.tt_stats["used"] / self.tt_stats["entries"])
+
+        depth_done, best_eval, best_move = best
+        if best_move is None:
+            best_move = self.gameEval.get_ordered_moves(game)[0]
+        return best_move, best_eval, depth_done
+
+    def split_abandoned(self):
+        """
+        In a worker, it tells if the split node of its task doesn't need it anymore: the node is finished or it got a cutoff
+        """
+        window = self.split_window
+        return window[0] != self.split_id or window[1] >= window[2]
+
+    def ybwc_root(self, depth:int, game:GameState):
+        """
+        Young Brothers Wait search of the position. It returns the best move and its evaluation
+        * Without the selective pruning (null move, late move reductions and futility), the evaluation is the one of the
+        serial search. With it, the evaluation can be different: the pruning depends on the window, and the young brothers
+        are searched with the window of the split node when their task starts, not with the one the serial search would have
+        """
+        self.searches += 1
+        self.splits = 0
+        self.splits_cutoff = 0
+        self.workers_counters = {}
+        self.tt.new_search()
+        self.ordering.new_search()
+        self.get_pool(game)
+
+        game = game.copy()
+        best_eval, best_move = self.ybwc(depth, game, -float("inf"), float("inf"), game.isWhiteTurn, True)
+        return best_move, best_eval
+
+    def ybwc(self, depth:int, game:GameState, alpha:float, beta:float, is_maximising_player:bool, root=False):
+        """
+        Young Brothers Wait Concept: https://www.chessprogramming.org/Young_Brothers_Wait_Concept
+        * The first (best ordered) move is searched before any other, splitting its own node in the same way.
+        So the nodes split are the root and the first nodes of the main line, while they have at least split_depth
+        * With the bound of the first move, the rest of the moves (the young brothers) are searched by the workers at the same time
+        * The window of the node is shared with the workers as it gets better. When it closes (a cutoff), the workers stop their tasks
+        It returns the evaluation and the best move
+        """
+        if depth < self.split_depth or game.theresCheckMate or game.theresDraw:
+            return self.minimax(depth, game, alpha, beta, is_maximising_player), None
+
+        alpha_0, beta_0 = alpha, beta
+        moves = self.gameEval.get_ordered_moves(game)
+        entry = self.tt.probe(game.zobrist_key)
+        if entry and entry[3]:
+            moves.sort(key=lambda move: encode_move(move) != entry[3])
+
+        def update(curr_eval, move):
+            # It returns True if there's a cutoff
+            nonlocal alpha, beta, best_eval, best_move
+            if not root:
+                if curr_eval > self.MATE_THRESHOLD:
+                    curr_eval -= 1
+                elif curr_eval < -self.MATE_THRESHOLD:
+                    curr_eval += 1
+            if (is_maximising_player and curr_eval > best_eval) or (not is_maximising_player and curr_eval < best_eval):
+                best_eval, best_move = curr_eval, move
+            if is_maximising_player:
+                alpha = max(alpha, best_eval)
+            else:
+                beta = min(beta, best_eval)
+            return alpha >= beta
+
+        best_eval, best_move = (-float("inf") if is_maximising_player else float("inf")), moves[0]
+
+        # The eldest brother
+        game.makeMove(moves[0])
+        curr_eval, _ = self.ybwc(depth - 1, game, alpha, beta, not is_maximising_player)
         game.undoMove()
+        cutoff = update(curr_eval, moves[0])
+
+        # The young brothers
+        if not cutoff and len(moves) > 1:
+            self.splits += 1
+            split_id = self.splits + 1000 * self.searches
+            window = self.split_window
+            window[1], window[2] = alpha, beta
+            window[0] = split_id
 
-        print("Move:" + str(time() - t0))
+            position = game.get_position()
+            options = self.search_options()
+            futures = {self.pool.submit(worker_search_split, self.searches, split_id, position, move, depth, alpha, beta, options): move
+                       for move in moves[1:]}
+            for future in concurrent.futures.as_completed(futures):
+                curr_eval, pid, _, counters = future.result()
+                # The last counters of every worker are the ones of the whole search
+                self.workers_counters[pid] = counters
+                if curr_eval is None:
+                    continue
+                if update(curr_eval, futures[future]):
+                    self.splits_cutoff += 1
+                    break
+                window[1], window[2] = alpha, beta
 
-        return game_eval, move
+            # The workers still searching this node stop
+            window[0] = -1
+            for future in futures:
+                future.cancel()
 
-    def minimax(self, depth:int, game:GameState, alpha:float, beta:float, is_maximising_player:bool):
+        if best_eval <= alpha_0:
+            bound = UPPER
+        elif best_eval >= beta_0:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(game.zobrist_key, depth, best_eval, bound, best_move if bound != (UPPER if is_maximising_player else LOWER) else None)
+
+        return best_eval, best_move
+
+    def search(self, game:GameState, max_depth=64, time_limit=None, node_limit=None, info=None):
+        """
+        Iterative deepening: it searches the depths 1, 2, 3... until max_depth or until the time (seconds) or the nodes are over.
+        * Every iteration tries first the best move of the previous one (and the transposition table keeps the rest of the work)
+        * It returns (best move, evaluation, depth) of the last depth fully searched, and the summary of self.stats
+        (see SearchStats.finish), or None without stats
+        * A new depth isn't started if the half of the time is already gone, it would hardly be finished
+        * With search_mode "negamax", every depth is searched with an aspiration window around the evaluation of the previous one
+        * info: Function called after every depth with (depth, evaluation, best move, seconds) instead of printing it
+        """
+        t0 = time()
+        self.nodes = 0
+        self.aspiration_researches = 0
+        self.pvs_researches = 0
+        self.reset_q_stats()
+        self.reset_pruning_stats()
+        self.node_limit = node_limit if node_limit is not None else float("inf")
+        self.deadline = t0 + time_limit if time_limit is not None else float("inf")
+        self.tt.new_search()
+        self.ordering.new_search()
+        if self.stats is not None:
+            self.stats.start(self)
+
+        ordered = self.gameEval.get_ordered_moves(game)
+        best_move, best_eval, depth_done = ordered[0] if ordered else None, 0, 0
+
+        for depth in range(1, max_depth + 1):
+            self.currentDepth = depth
+            root = game.copy()
+            if self.stats is not None:
+                self.stats.instrument(root)
+            try:
+                if self.search_mode == "negamax":
+                    move, evaluation = self.aspiration_root(root, depth, best_move, best_eval if depth_done else None)
+                else:
+                    move, evaluation = self.search_root(root, depth, best_move)
+            except SearchTimeout:
+                break
+            best_move, best_eval, depth_done = move, evaluation, depth
+            if self.stats is not None:
+                self.stats.depth_done(self, depth, evaluation, move, time() - t0)
+            if info is not None:
+                info(depth, evaluation, move, time() - t0)
+            else:
+                print("Depth " + str(depth) + ": " + str(evaluation) + " Nodes: " + str(self.nodes) + " Quiescence nodes: " + str(self.q_stats["nodes"]) +
+                      " First move cutoffs: " + "{:.2%}".format(self.ordering.stats()["first_move_cutoff_rate"]) +
+                      " Researches (aspiration, PVS): " + str(self.aspiration_researches) + ", " + str(self.pvs_researches) +
+                      " Pruning: " + str(self.pruning_stats) + " Time: " + str(time() - t0))
+
+            if abs(evaluation) > self.MATE_THRESHOLD or time() - t0 > (self.deadline - t0) / 2:
+                break
+
+        self.deadline = float("inf")
+        self.node_limit = float("inf")
+        stats = self.stats.finish(self, best_move, best_eval, depth_done) if self.stats is not None else None
+        return best_move, best_eval, depth_done, stats
+
+    def search_root(self, game:GameState, depth:int, first_move=None):
+        """
+        It searches all the moves of the position with alpha-beta, trying 'first_move' first.
+        It returns the best move and its evaluation.
+        """
+        maximize = game.isWhiteTurn
+        alpha, beta = -float("inf"), float("inf")
+
+        moves = self.gameEval.get_ordered_moves(game)
+        if first_move is not None:
+            moves.sort(key=lambda move: move != first_move)
+
+        best_move, best_eval = moves[0], -float("inf") if maximize else float("inf")
+        for move in moves:
+            game.makeMove(move)
+            curr_eval = self.minimax(depth - 1, game, alpha, beta, not maximize)
+            game.undoMove()
+
+            if (maximize and curr_eval > best_eval) or (not maximize and curr_eval < best_eval):
+                best_move, best_eval = move, curr_eval
+            if maximize:
+                alpha = max(alpha, best_eval)
+            else:
+                beta = min(beta, best_eval)
+
+        self.tt.store(game.zobrist_key, depth, best_eval, EXACT, best_move)
+        return best_move, best_eval
+
+    def aspiration_root(self, game:GameState, depth:int, first_move=None, guess=None):
+        """
+        Aspiration windows: https://www.chessprogramming.org/Aspiration_Windows
+        * The position is searched with a small window around 'guess' (the evaluation of the previous depth)
+        * If the evaluation falls out of the window, that side of the window is made wider and it's searched again
+        It returns the best move and its evaluation
+        """
+        if guess is None or depth < self.aspiration_depth or abs(guess) > self.MATE_THRESHOLD:
+            return self.negamax_root(game, depth, first_move, -float("inf"), float("inf"))
+
+        delta_low = delta_high = self.aspiration_delta
+        while True:
+            alpha = guess - delta_low if delta_low < 1000 else -float("inf")
+            beta = guess + delta_high if delta_high < 1000 else float("inf")
+            move, evaluation = self.negamax_root(game, depth, first_move, alpha, beta)
+            if evaluation <= alpha and alpha != -float("inf"):
+                delta_low *= 4
+            elif evaluation >= beta and beta != float("inf"):
+                delta_high *= 4
+            else:
+                return move, evaluation
+            self.aspiration_researches += 1
+
+    def negamax_root(self, game:GameState, depth:int, first_move=None, alpha=-float("inf"), beta=float("inf")):
+        """
+        It searches all the moves of the position with negamax, trying 'first_move' first.
+        * alpha, beta and the evaluation returned are from the point of view of white, as in minimax
+        It returns the best move and its evaluation
+        """
+        color = 1 if game.isWhiteTurn else -1
+        if color == -1:
+            alpha, beta = -beta, -alpha
+        alpha_0 = alpha
+
+        moves = self.gameEval.get_ordered_moves(game)
+        if first_move is not None:
+            moves.sort(key=lambda move: move != first_move)
+
+        best_move, best_eval = moves[0], -float("inf")
+        for index, move in enumerate(moves):
+            game.makeMove(move)
+            curr_eval = self.negamax_child(depth - 1, game, alpha, beta, color, index == 0)
+            game.undoMove()
+
+            if curr_eval > best_eval:
+                best_move, best_eval = move, curr_eval
+            alpha = max(alpha, best_eval)
+            if alpha >= beta:
+                break
+
+        if alpha_0 < best_eval < beta:
+            self.tt.store(game.zobrist_key, depth, best_eval * color, EXACT, best_move)
+        return best_move, best_eval * color
+
+    def negamax_child(self, depth:int, game:GameState, alpha:float, beta:float, color:int, first:bool, reduction=0):
+        """
+        Principal variation search of a move already done: https://www.chessprogramming.org/Principal_Variation_Search
+        * The first move is searched with the whole window
+        * The rest are searched with a null window, only to know if they are better than alpha. If one is, it's searched
+        again with the whole window to get its evaluation
+        * With a reduction (late move reductions, see self.pruning) the null window search has less depth, and it's repeated
+        with the whole depth if the move is better than alpha
+        It returns the evaluation from the point of view of the player that has done the move
+        """
+        if first:
+            return -self.negamax(depth, game, -beta, -alpha, -color)
+        if reduction:
+            self.pruning_stats["lmr_reductions"] += 1
+            curr_eval = -self.negamax(depth - reduction, game, -alpha - 1, -alpha, -color)
+            if curr_eval <= alpha:
+                return curr_eval
+            self.pruning_stats["lmr_researches"] += 1
+        curr_eval = -self.negamax(depth, game, -alpha - 1, -alpha, -color)
+        if alpha < curr_eval < beta:
+            self.pvs_researches += 1
+            curr_eval = -self.negamax(depth, game, -beta, -alpha, -color)
+        return curr_eval
+
+    def negamax(self, depth:int, game:GameState, alpha:float, beta:float, color:int, null_allowed=True):
+        """
+        Negamax: https://www.chessprogramming.org/Negamax
+        The same search as minimax, but the evaluation is always from the point of view of the player to move
+        (color is 1 if it's white and -1 if it's black), so the maximising and minimising branches are the same.
+        * The scores of the transposition table are from the point of view of white, so it can be shared with minimax
+        * null_allowed is False after a null move, two in a row aren't done (see self.pruning)
+        """
+        self.nodes += 1
+        if self.nodes >= self.node_limit or time() >= self.deadline:
+            raise SearchTimeout()
+        if self.split_id is not None and self.nodes % 256 == 0 and self.split_abandoned():
+            raise SearchTimeout()
+
+        if game.theresCheckMate:
+            return -self.MATE_SCORE
+        elif game.theresDraw or (self.repetition_draws and game.repetitions()):
+            return 0
+
+        score = self.tablebase_score(game)
+        if score is not None:
+            return score
+
+        if depth == 0:
+            if self.quiescence_search:
+                self.q_stats["leaves"] += 1
+                self.q_nodes = 0
+                if color == 1:
+                    return self.quiescence(game, alpha, beta, True)
+                return -self.quiescence(game, -beta, -alpha, False)
+            return color * self.gameEval.eval_pos(game)
+
+        # Use the stored search of the position if it is deep enough
+        key = game.zobrist_key
+        entry = self.tt.probe(key)
+        hash_move = 0
+        if entry:
+            tt_depth, tt_score, tt_bound, hash_move = entry
+            if tt_depth >= depth:
+                tt_score *= color
+                if color == -1 and tt_bound != EXACT:
+                    tt_bound = LOWER if tt_bound == UPPER else UPPER
+                if tt_bound == EXACT:
+                    self.tt.cutoffs += 1
+                    return tt_score
+                elif tt_bound == LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    self.tt.cutoffs += 1
+                    return tt_score
+        alpha_0, beta_0 = alpha, beta
+
+        pruning = self.pruning(depth, game, alpha, beta, color, null_allowed, True)
+        if pruning is True:
+            # The null move failed high. The bound can be a float of the shared window (see worker_search_split), and
+            # the scores of the transposition table are integers
+            return int(beta)
+        futile, reducible = pruning
+
+        ply = len(game.move_log)
+        best_eval = -float("inf")
+        best_found = None
+        for index, move in enumerate(self.ordering.ordered_moves(game, hash_move, ply)):
+            quiet = not self.ordering.is_tactical(game, move)
+            game.makeMove(move)
+            quiet = quiet and not game.theresCheck
+            if futile and quiet and index > 0:
+                game.undoMove()
+                self.pruning_stats["futility_pruned"] += 1
+                continue
+            reduction = 1 if reducible and quiet and index >= self.lmr_moves else 0
+            curr_eval = self.negamax_child(depth - 1, game, alpha, beta, color, index == 0, reduction)
+            game.undoMove()
+            # The fastest mate is the best one
+            if curr_eval > self.MATE_THRESHOLD:
+                curr_eval -= 1
+            elif curr_eval < -self.MATE_THRESHOLD:
+                curr_eval += 1
+
+            if curr_eval > best_eval:
+                best_eval = curr_eval
+                best_found = move
+            alpha = max(alpha, best_eval)
+            if alpha >= beta:
+                self.ordering.cutoff(game, move, index, depth, ply)
+                break
+
+        if best_eval <= alpha_0:
+            bound = UPPER
+            best_found = None
+        elif best_eval >= beta_0:
+            bound = LOWER
+        else:
+            bound = EXACT
+        # Stored from the point of view of white
+        if color == -1 and bound != EXACT:
+            bound = LOWER if bound == UPPER else UPPER
+        self.tt.store(key, depth, best_eval * color, bound, best_found)
+
+        return best_eval
+
+    def minimax(self, depth:int, game:GameState, alpha:float, beta:float, is_maximising_player:bool, null_allowed=True):
         """
         Core minimax logic.
         https://en.wikipedia.org/wiki/Minimax
+        * null_allowed is False after a null move, two in a row aren't done (see self.pruning)
         """
+        self.nodes += 1
+        if self.nodes >= self.node_limit or time() >= self.deadline:
+            raise SearchTimeout()
+        if self.split_id is not None and self.nodes % 256 == 0 and self.split_abandoned():
+            raise SearchTimeout()
+
         if game.theresCheckMate:
             # The previous move resulted in checkmate
             return -self.MATE_SCORE if is_maximising_player else self.MATE_SCORE
         # When the game is over and it's not a checkmate it's a draw
         # In this case, don't evaluate. Just return a neutral result: zero
-        elif game.theresDraw:    
+        elif game.theresDraw or (self.repetition_draws and game.repetitions()):
             return 0
 
+        score = self.tablebase_score(game)
+        if score is not None:
+            return score if game.isWhiteTurn else -score
+
         if depth == 0:
+            if self.quiescence_search:
+                self.q_stats["leaves"] += 1
+                self.q_nodes = 0
+                return self.quiescence(game, alpha, beta, is_maximising_player)
             return self.gameEval.eval_pos(game)
 
+        # Use the stored search of the position if it is deep enough
+        key = game.zobrist_key
+        entry = self.tt.probe(key)
+        hash_move = 0
+        if entry:
+            tt_depth, tt_score, tt_bound, hash_move = entry
+            if tt_depth >= depth:
+                if tt_bound == EXACT:
+                    self.tt.cutoffs += 1
+                    return tt_score
+                elif tt_bound == LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    self.tt.cutoffs += 1
+                    return tt_score
+        alpha_0, beta_0 = alpha, beta
+
+        if is_maximising_player:
+            pruning = self.pruning(depth, game, alpha, beta, 1, null_allowed)
+        else:
+            pruning = self.pruning(depth, game, -beta, -alpha, -1, null_allowed)
+        if pruning is True:
+            # The null move failed high. The bound can be a float of the shared window (see worker_search_split), and
+            # the scores of the transposition table are integers
+            return int(beta) if is_maximising_player else int(alpha)
+        futile, reducible = pruning
+
+        # The moves are given by stages, the best move of the stored search first
+        ply = len(game.move_log)
+        moves = self.ordering.ordered_moves(game, hash_move, ply)
+        best_found = None
+
         if is_maximising_player:
             best_move = -float("inf")
-            moves = self.gameEval.get_ordered_moves(game)
-            #moves = game.legal_moves
-            for move in moves:
-                game.makeMove(move)
-                curr_eval = self.minimax(depth - 1, game, alpha, beta, not is_maximising_player)
+            for index, move in enumerate(moves):
+                curr_eval = self.minimax_child(depth, game, move, index, alpha, beta, is_maximising_player, futile, reducible)
+                if curr_eval is None:
+                    continue
                 # Each ply after a checkmate is slower, so they get ranked slightly less
                 # We want the fastest mate!
                 if curr_eval > self.MATE_THRESHOLD:
                     curr_eval -= 1
                 elif curr_eval < -self.MATE_THRESHOLD:
                     curr_eval += 1
-                best_move = max(best_move, curr_eval)
-                game.undoMove()
+                if curr_eval > best_move:
+                    best_move = curr_eval
+                    best_found = move
 
                 alpha = max(alpha, best_move)
                 if beta <= alpha:
-                    return best_move
-            return best_move
+                    self.ordering.cutoff(game, move, index, depth, ply)
+                    break
             
         else:
             best_move = float("inf")
-            moves = self.gameEval.get_ordered_moves(game)
-            #moves = game.legal_moves
-            for move in moves:
-                game.makeMove(move)
-                curr_eval = self.minimax(depth - 1, game, alpha, beta, not is_maximising_player)
+            for index, move in enumerate(moves):
+                curr_eval = self.minimax_child(depth, game, move, index, alpha, beta, is_maximising_player, futile, reducible)
+                if curr_eval is None:
+                    continue
                 if curr_eval > self.MATE_THRESHOLD:
                     curr_eval -= 1
                 elif curr_eval < -self.MATE_THRESHOLD:
                     curr_eval += 1
-                best_move = min(best_move, curr_eval)
-                game.undoMove()
+                if curr_eval < best_move:
+                    best_move = curr_eval
+                    best_found = move
 
                 beta = min(beta, best_move)
                 if beta <= alpha:
-                    return best_move
-            return best_move
+                    self.ordering.cutoff(game, move, index, depth, ply)
+                    break
+
+        # The score is exact only if it's inside the window of the search
+        if best_move <= alpha_0:
+            bound = UPPER
+        elif best_move >= beta_0:
+            bound = LOWER
+        else:
+            bound = EXACT
+        # If every move failed for the player there isn't a best move
+        if (is_maximising_player and bound == UPPER) or (not is_maximising_player and bound == LOWER):
+            best_found = None
+        self.tt.store(key, depth, best_move, bound, best_found)
+
+        return best_move
+
+    def minimax_child(self, depth:int, game:GameState, move:Move, index:int, alpha:float, beta:float, is_maximising_player:bool, futile:bool, reducible:bool):
+        """
+        It does the move number 'index' of a minimax node, searches it and undoes it.
+        * futile and reducible are given by self.pruning. They only affect the quiet moves (no captures, promotions or checks)
+        after the first one
+        It returns the evaluation of the move, or None if it has been pruned
+        """
+        quiet = not self.ordering.is_tactical(game, move)
+        game.makeMove(move)
+        quiet = quiet and not game.theresCheck
+
+        if futile and quiet and index > 0:
+            game.undoMove()
+            self.pruning_stats["futility_pruned"] += 1
+            return None
+
+        if reducible and quiet and index >= self.lmr_moves and (alpha if is_maximising_player else beta) not in (float("inf"), -float("inf")):
+            # Late move reduction: it's searched one ply less, only to know if it's better than the bound
+            self.pruning_stats["lmr_reductions"] += 1
+            if is_maximising_player:
+                curr_eval = self.minimax(depth - 2, game, alpha, alpha + 1, False)
+                reduced = curr_eval <= alpha
+            else:
+                curr_eval = self.minimax(depth - 2, game, beta - 1, beta, True)
+                reduced = curr_eval >= beta
+            if reduced:
+                game.undoMove()
+                return curr_eval
+            self.pruning_stats["lmr_researches"] += 1
+
+        curr_eval = self.minimax(depth - 1, game, alpha, beta, not is_maximising_player)
+        game.undoMove()
+        return curr_eval
+
+    def pruning(self, depth:int, game:GameState, alpha:float, beta:float, color:int, null_allowed:bool, negamax=False):
+        """
+        Selective pruning of a node of minimax or negamax. alpha and beta are from the point of view of the player to move (color)
+        * Null move pruning: if the player could pass and the opponent still can't avoid that the evaluation is >= beta, the node is
+        pruned. It isn't done in check, without pieces (zugzwang) or after another null move
+        * Futility pruning: near the leaves, if the evaluation plus the margin of GameEval can't reach alpha, the quiet moves are pruned
+        * Late move reductions: the quiet moves ordered late are searched with less depth (see minimax_child and negamax_child)
+        It returns True if the null move pruned the node, if not (futile, reducible) for the moves of the node
+        """
+        in_check = game.theresCheck
+        futile = reducible = False
+        if in_check:
+            return futile, reducible
+
+        reducible = self.late_move_reductions and depth >= 3
+        margin = self.gameEval.futility_margins.get(depth)
+        if not (self.futility_pruning and margin) and not (self.null_move_pruning and null_allowed and depth >= 3):
+            return futile, reducible
+
+        static_eval = self.gameEval.eval_pos(game) * color
+        if self.futility_pruning and margin and static_eval + margin <= alpha:
+            futile = True
+
+        if self.null_move_pruning and null_allowed and depth >= 3 and static_eval >= beta and beta != float("inf"):
+            p = "w" if game.isWhiteTurn else "b"
+            counts = game.piece_counts
+            if counts[p + "N"] + counts[p + "B"] + counts[p + "R"] + counts[p + "Q"] > 0:
+                self.pruning_stats["null_moves"] += 1
+                game.makeNullMove()
+                if negamax:
+                    curr_eval = -self.negamax(depth - 1 - self.null_move_reduction, game, -beta, -beta + 1, -color, False)
+                elif color == 1:
+                    curr_eval = self.minimax(depth - 1 - self.null_move_reduction, game, beta - 1, beta, False, False)
+                else:
+                    curr_eval = -self.minimax(depth - 1 - self.null_move_reduction, game, -beta, -beta + 1, True, False)
+                game.undoNullMove()
+                if curr_eval >= beta:
+                    self.pruning_stats["null_move_cutoffs"] += 1
+                    return True
+
+        return futile, reducible
+
+    def reset_pruning_stats(self):
+        self.pruning_stats = {"null_moves": 0, "null_move_cutoffs": 0, "lmr_reductions": 0, "lmr_researches": 0, "futility_pruned": 0}
+
+    def reset_q_stats(self):
+        self.q_stats = {"nodes": 0, "leaves": 0, "cutoffs": 0, "limit_reached": 0, "max_depth": 0}
+
+    def quiescence(self, game:GameState, alpha:float, beta:float, is_maximising_player:bool, q_depth=0):
+        """
+        Quiescence search: https://www.chessprogramming.org/Quiescence_Search
+        * At the leaves of minimax, only the captures and the promotions are searched until the position is quiet,
+        so a position with a pending capture isn't evaluated as if it weren't there
+        * The player can always stop capturing (stand pat): the evaluation of the position is a bound
+        * The moves go ordered by evaluate_capture, the most valuable trades first
+        * Delta pruning: a capture isn't searched if even winning the piece (plus q_delta) can't improve the bound
+        * When a leaf has used q_node_limit nodes the rest of its positions are just evaluated. Which positions those are
+        depends on the window and on the order of the search, so minimax and negamax only get the same evaluations with
+        q_node_limit = float("inf") (and without the selective pruning, see self.pruning)
+        * Its nodes count for the limits of the search too
+        """
+        self.nodes += 1
+        if self.nodes >= self.node_limit or time() >= self.deadline:
+            raise SearchTimeout()
+        if self.split_id is not None and self.nodes % 256 == 0 and self.split_abandoned():
+            raise SearchTimeout()
+
+        self.q_nodes += 1
+        self.q_stats["nodes"] += 1
+        if q_depth > self.q_stats["max_depth"]:
+            self.q_stats["max_depth"] = q_depth
+
+        if game.theresCheckMate:
+            return -self.MATE_SCORE if is_maximising_player else self.MATE_SCORE
+        elif game.theresDraw:
+            return 0
+
+        stand_pat = self.gameEval.eval_pos(game)
+        if self.q_nodes >= self.q_node_limit:
+            self.q_stats["limit_reached"] += 1
+            return stand_pat
+
+        if is_maximising_player:
+            if stand_pat >= beta:
+                self.q_stats["cutoffs"] += 1
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                self.q_stats["cutoffs"] += 1
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        last_row = 0 if game.isWhiteTurn else 7
+        piece_values = self.gameEval.piece_values
+        moves = []
+        for move in game.legal_moves:
+            promotion = move.piece[1] == "p" and move.y1 == last_row
+            if not promotion and move.piece_capt != "--":
+                gain = piece_values[move.piece_capt[1]] + self.q_delta
+                if (is_maximising_player and stand_pat + gain <= alpha) or (not is_maximising_player and stand_pat - gain >= beta):
+                    continue
+            if move.piece_capt != "--" or move.paso or promotion:
+                value = self.gameEval.evaluate_capture(game, move) if move.piece_capt != "--" or move.paso else 0
+                if promotion:
+                    value += piece_values["Q"] - piece_values["p"]
+                moves.append((value, move))
+        moves.sort(key=lambda value_move: value_move[0], reverse=True)
+
+        best_move = stand_pat
+        for _, move in moves:
+            game.makeMove(move)
+            curr_eval = self.quiescence(game, alpha, beta, not is_maximising_player, q_depth + 1)
+            game.undoMove()
+            if curr_eval > self.MATE_THRESHOLD:
+                curr_eval -= 1
+            elif curr_eval < -self.MATE_THRESHOLD:
+                curr_eval += 1
+
+            if is_maximising_player:
+                best_move = max(best_move, curr_eval)
+                alpha = max(alpha, best_move)
+            else:
+                best_move = min(best_move, curr_eval)
+                beta = min(beta, best_move)
+            if beta <= alpha:
+                self.q_stats["cutoffs"] += 1
+                break
+
+        return best_move
 
 
 
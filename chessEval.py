@@ -1,76 +1,34 @@
-from copy import deepcopy
 from collections import Counter
 
 from chessRules import GameState, Move
+from chessTables import PIECE_VALUES, PAWNS_W_OPENING, KNIGHTS_W_OPENING, BISHOPS_W_OPENING, ROCKS_W_OPENING, QUEEN_W_OPENING, \
+                        KING_W_OPENING, PIECES_OPENING_TABLES_W
 
 class GameEval():
     def __init__(self, game:GameState):
         self.current_game = game
-        self.predicted = deepcopy(game)
+        self.predicted = game.copy()
 
         self.pos_evaluation = 0
 
         self.finishedEvaluation = True
 
-        self.piece_values = {"p":100, "R":500, "N":320, "B":330, "Q":900, "K":20000}
-
-        self.pawns_W_opening = [0,  0,  0,  0,  0,  0,  0,  0,
-                                50, 50, 50, 50, 50, 50, 50, 50,
-                                10, 10, 20, 30, 30, 20, 10, 10,
-                                5,  5, 10, 25, 25, 10,  5,  5,
-                                0,  0,  0, 20, 20,  0,  0,  0,
-                                5, -5,-10,  0,  0,-10, -5,  5,
-                                5, 10, 10,-20,-20, 10, 10,  5,
-                                0,  0,  0,  0,  0,  0,  0,  0]
-
-        self.knights_W_opening= [-50,-40,-30,-30,-30,-30,-40,-50,
-                                -40,-20,  0,  0,  0,  0,-20,-40,
-                                -30,  0, 10, 15, 15, 10,  0,-30,
-                                -30,  5, 15, 20, 20, 15,  5,-30,
-                                -30,  0, 15, 20, 20, 15,  0,-30,
-                                -30,  5, 10, 15, 15, 10,  5,-30,
-                                -40,-20,  0,  5,  5,  0,-20,-40,
-                                -50,-40,-30,-30,-30,-30,-40,-50]
-
-        self.bishops_W_opening= [-20,-10,-10,-10,-10,-10,-10,-20,
-                                -10,  0,  0,  0,  0,  0,  0,-10,
-                                -10,  0,  5, 10, 10,  5,  0,-10,
-                                -10,  5,  5, 10, 10,  5,  5,-10,
-                                -10,  0, 10, 10, 10, 10,  0,-10,
-                                -10, 10, 10, 10, 10, 10, 10,-10,
-                                -10,  5,  0,  0,  0,  0,  5,-10,
-                                -20,-10,-10,-10,-10,-10,-10,-20]
-
-        self.rocks_W_opening = [0,  0,  0,  0,  0,  0,  0,  0,
-                                5, 10, 10, 10, 10, 10, 10,  5,
-                                -5,  0,  0,  0,  0,  0,  0, -5,
-                                -5,  0,  0,  0,  0,  0,  0, -5,
-                                -5,  0,  0,  0,  0,  0,  0, -5,
-                                -5,  0,  0,  0,  0,  0,  0, -5,
-                                -5,  0,  0,  0,  0,  0,  0, -5,
-                                0,  0,  0,  5,  5,  0,  0,  0]
-
-        self.queen_W_opening= [-20,-10,-10, -5, -5,-10,-10,-20,
-                                -10,  0,  0,  0,  0,  0,  0,-10,
-                                -10,  0,  5,  5,  5,  5,  0,-10,
-                                -5,  0,  5,  5,  5,  5,  0, -5,
-                                0,  0,  5,  5,  5,  5,  0, -5,
-                                -10,  5,  5,  5,  5,  5,  0,-10,
-                                -10,  0,  5,  0,  0,  0,  0,-10,
-                                -20,-10,-10, -5, -5,-10,-10,-20]
-
-        self.king_W_opening= [-30,-40,-40,-50,-50,-40,-40,-30,
-                            -30,-40,-40,-50,-50,-40,-40,-30,
-                            -30,-40,-40,-50,-50,-40,-40,-30,
-                            -30,-40,-40,-50,-50,-40,-40,-30,
-                            -20,-30,-30,-40,-40,-30,-30,-20,
-                            -10,-20,-20,-20,-20,-20,-20,-10,
-                            20, 20,  0,  0,  0,  0, 20, 20,
-                            20, 30, 10,  0,  0, 10, 30, 20]
-
-        self.pieces_opening_tables_W = {"p":self.pawns_W_opening, "R":self.rocks_W_opening, 
-                                        "N":self.knights_W_opening, "B":self.bishops_W_opening, 
-                                        "Q":self.queen_W_opening, "K":self.king_W_opening}
+        self.piece_values = PIECE_VALUES
+
+        self.pawns_W_opening = PAWNS_W_OPENING
+        self.knights_W_opening = KNIGHTS_W_OPENING
+        self.bishops_W_opening = BISHOPS_W_OPENING
+        self.rocks_W_opening = ROCKS_W_OPENING
+        self.queen_W_opening = QUEEN_W_OPENING
+        self.king_W_opening = KING_W_OPENING
+
+        self.pieces_opening_tables_W = PIECES_OPENING_TABLES_W
+
+        # Margins of the futility pruning of the engine, by the depth left: how much a quiet move could improve the evaluation
+        self.futility_margins = {1: 200, 2: 500}
+
+        # If True, eval_pos compares the running scores of the GameState with the full recalculation (slow, to debug)
+        self.check_incremental = False
 
 
     def eval_position(self, game:GameState):
@@ -81,6 +39,24 @@ class GameEval():
         self.finishedEvaluation = True
 
     def eval_pos(self, game:GameState):
+        """
+        It evaluates the position with the running scores of the GameState (material and piece-square tables) and the pawns structure.
+        * If self.check_incremental, the result is compared with eval_pos_full
+        """
+        pos_evaluation = game.material_score + game.position_score
+        pos_evaluation += self.checkDoubledBlockedIsolated_Pawns(game.board, game.pawns_pos["wp"], game.pawns_pos["bp"])
+
+        if self.check_incremental:
+            full_evaluation = self.eval_pos_full(game)
+            if full_evaluation != pos_evaluation:
+                raise Exception(f"The running evaluation {pos_evaluation} doesn't match the full one {full_evaluation}")
+
+        return pos_evaluation
+
+    def eval_pos_full(self, game:GameState):
+        """
+        It evaluates the position scanning the whole board (the running scores aren't used)
+        """
         board = game.board
 
         pos_evaluation = 0
@@ -0,0 +1,126 @@
+from chessRules import GameState, Move
+from chessTables import PIECE_VALUES
+from chessTransposition import encode_move
+
+
+class MoveOrdering():
+    def __init__(self):
+        """
+        Order of the moves of ChessEngine.minimax: https://www.chessprogramming.org/Move_Ordering
+        * The moves are given by stages (see ordered_moves): hash move, captures, killer moves and quiet moves.
+        If a move gets a cutoff, the next stages aren't prepared
+        * Killer moves: the quiet moves that got a cutoff in the same ply (two for every ply)
+        * History: for every piece and destination square, how many cutoffs got its quiet moves (weighted by the depth)
+        """
+        self.killers = {}
+        self.history = {}
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """
+        It has to be called before every search: the killers of the previous one are removed and the history is halved,
+        so the newest cutoffs count more
+        """
+        self.killers = {}
+        for key in self.history:
+            self.history[key] //= 2
+        self.reset_stats()
+
+    def stats(self):
+        """
+        It returns a dict with the cutoffs, the cutoffs of the first move searched and their rate (how good the order is)
+        """
+        return {"cutoffs": self.cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0}
+
+    def is_tactical(self, game:GameState, move:Move):
+        """
+        It tells if the move is a capture or a promotion
+        """
+        if move.piece_capt != "--" or move.paso:
+            return True
+        return move.piece[1] == "p" and move.y1 == (0 if game.isWhiteTurn else 7)
+
+    def mvv_lva(self, move:Move):
+        """
+        Most Valuable Victim - Least Valuable Aggressor: the captures of the best pieces go first, and between them,
+        the ones done by the worst pieces. The promotions count as capturing a queen
+        """
+        value = 0
+        if move.piece_capt != "--":
+            value += 10 * PIECE_VALUES[move.piece_capt[1]]
+        elif move.paso:
+            value += 10 * PIECE_VALUES["p"]
+        if move.piece[1] == "p" and move.y1 in (0, 7):
+            value += 10 * PIECE_VALUES["Q"]
+        return value - PIECE_VALUES[move.piece[1]] // 100
+
+    def ordered_moves(self, game:GameState, hash_move=0, ply=0):
+        """
+        It yields the legal moves of the position by stages:
+        1. The hash move (the best move of the transposition table, encoded as in encode_move)
+        2. The captures and promotions, by MVV-LVA
+        3. The killer moves of the ply
+        4. The rest of quiet moves, by history
+        """
+        moves = game.legal_moves
+
+        first = None
+        if hash_move:
+            for move in moves:
+                if encode_move(move) == hash_move:
+                    first = move
+                    yield move
+                    break
+
+        captures = []
+        quiets = []
+        for move in moves:
+            if move is first:
+                continue
+            if self.is_tactical(game, move):
+                captures.append(move)
+            else:
+                quiets.append(move)
+
+        captures.sort(key=self.mvv_lva, reverse=True)
+        yield from captures
+
+        killers = self.killers.get(ply, ())
+        if killers:
+            rest = []
+            for move in quiets:
+                if encode_move(move) in killers:
+                    yield move
+                else:
+                    rest.append(move)
+            quiets = rest
+
+        history = self.history
+        quiets.sort(key=lambda move: history.get((move.piece, move.y1*8 + move.x1), 0), reverse=True)
+        yield from quiets
+
+    def cutoff(self, game:GameState, move:Move, index:int, depth:int, ply:int):
+        """
+        It's called when 'move', the number 'index' searched in the node, gets a cutoff.
+        If it's a quiet move, it becomes a killer of the ply and its history gets better
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if self.is_tactical(game, move):
+            return
+
+        encoded = encode_move(move)
+        killers = self.killers.get(ply, ())
+        if encoded not in killers:
+            self.killers[ply] = (encoded,) + killers[:1]
+
+        key = (move.piece, move.y1*8 + move.x1)
+        self.history[key] = self.history.get(key, 0) + depth * depth
@@ -0,0 +1,111 @@
+import argparse
+from time import time
+
+from chessRules import GameState, Move
+from chessBitboard import BitboardGameState
+
+# Reference positions: https://www.chessprogramming.org/Perft_Results
+# The counts are only given up to the depths without promotions, because GameState always promotes to a queen
+REFERENCE_POSITIONS = [("Initial position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281]),
+                       ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+                       ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+                       ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6]),
+                       ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890])]
+
+
+def move_name(move:Move):
+    """
+    The move in coordinates notation, as "e2e4"
+    """
+    return "abcdefgh"[move.x0] + str(8 - move.y0) + "abcdefgh"[move.x1] + str(8 - move.y1)
+
+
+def perft(game:GameState, depth:int, table=None):
+    """
+    It counts the leaf nodes of the tree of legal moves of 'depth' plies: https://www.chessprogramming.org/Perft
+    * The last ply isn't played, the legal moves are just counted
+    * table: Optional dict to store the counts by (Zobrist key, depth), so the transpositions are counted only once
+    """
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return len(game.legal_moves)
+
+    if table is not None:
+        key = (game.zobrist_key, depth)
+        if key in table:
+            return table[key]
+
+    nodes = 0
+    for move in game.legal_moves:
+        game.makeMove(move)
+        nodes += perft(game, depth - 1, table)
+        game.undoMove()
+
+    if table is not None:
+        table[key] = nodes
+    return nodes
+
+
+def divide(game:GameState, depth:int, table=None):
+    """
+    It returns a dict with the perft of 'depth' of every legal move, by its name (see move_name), to find the moves that are wrong
+    """
+    counts = {}
+    for move in game.legal_moves:
+        game.makeMove(move)
+        counts[move_name(move)] = perft(game, depth - 1, table)
+        game.undoMove()
+    return counts
+
+
+def run_suite(max_depth=3, game_class=BitboardGameState, hashing=False):
+    """
+    It runs the perft of the reference positions up to max_depth, printing the nodes per second.
+    It returns True if all the counts are right
+    """
+    all_right = True
+    total_nodes = 0
+    t0 = time()
+    for name, fen, counts in REFERENCE_POSITIONS:
+        game = game_class.from_fen(fen)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            t = time()
+            nodes = perft(game, depth, {} if hashing else None)
+            elapsed = time() - t
+            total_nodes += nodes
+            right = nodes == expected
+            all_right = all_right and right
+            print("{:<17} depth {}: {:>9} nodes {:>6} {:>10.0f} nodes/s".format(name, depth, nodes, "OK" if right else "FAIL " + str(expected),
+                                                                                   nodes / elapsed if elapsed else 0))
+    elapsed = time() - t0
+    print("Total: {} nodes in {:.2f} s, {:.0f} nodes/s".format(total_nodes, elapsed, total_nodes / elapsed if elapsed else 0))
+    return all_right
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft of the legal moves of chessRules")
+    parser.add_argument("--fen", help="Position to count (the initial one by default)")
+    parser.add_argument("--depth", type=int, default=3, help="Depth of the perft (the maximum depth with --suite)")
+    parser.add_argument("--divide", action="store_true", help="Print the count of every legal move")
+    parser.add_argument("--hash", action="store_true", help="Count the transpositions only once")
+    parser.add_argument("--mailbox", action="store_true", help="Use GameState instead of BitboardGameState")
+    parser.add_argument("--suite", action="store_true", help="Check the reference positions")
+    args = parser.parse_args()
+
+    game_class = GameState if args.mailbox else BitboardGameState
+    if args.suite:
+        raise SystemExit(0 if run_suite(args.depth, game_class, args.hash) else 1)
+
+    game = game_class.from_fen(args.fen or REFERENCE_POSITIONS[0][1])
+    table = {} if args.hash else None
+    t0 = time()
+    if args.divide:
+        counts = divide(game, args.depth, table)
+        for name, nodes in sorted(counts.items()):
+            print(name + ": " + str(nodes))
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game, args.depth, table)
+    elapsed = time() - t0
+    print("Nodes: {} Time: {:.2f} s Nodes/s: {:.0f}".format(nodes, elapsed, nodes / elapsed if elapsed else 0))
@@ -0,0 +1,293 @@
+"""
+Profiler of the engine and of the rules, to find which hot functions dominate a workload.
+* Timing hooks: the hot methods (HOT_FUNCTIONS) are wrapped in their classes while the profiler runs, counting their calls
+and their time (with the time of the functions they call)
+* Sampling: a thread takes the stack of the profiled thread every 'interval' seconds, without changing the code that runs
+* The worker processes of ChessEngine save their own profile after every task (see ChessEngine.profile_dir), and
+merge_profiles adds them up with the one of the main process
+* The samples are written as collapsed stacks ("a;b;c count" lines) for the flame graphs of
+https://github.com/brendangregg/FlameGraph, and as a summary table by function
+* Usage: python chessProfiler.py --depth 4 --output profile (see the options at the end of the module)
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+from time import perf_counter, time
+
+from chessRules import GameState
+from chessBitboard import BitboardGameState
+from chessEval import GameEval
+
+# Methods timed by the hooks, by class. Only the ones defined in the class itself are wrapped (not the inherited ones).
+# A method that calls the one of its base class (as BitboardGameState.copy) is only timed in the base class, if not its calls
+# would be counted twice
+HOT_FUNCTIONS = {GameState: ("calc_legal_moves", "is_square_attacked", "copy", "makeMove", "undoMove"),
+                 BitboardGameState: ("calc_legal_moves", "is_square_attacked"),
+                 GameEval: ("eval_pos", "get_ordered_moves")}
+
+# With all_threads, the samples of the threads waiting in these modules (locks, queues, pipes) aren't kept
+IDLE_MODULES = ("threading", "selectors", "queue", "queues", "connection")
+
+# Function where the tasks of a worker process start: the frames under it are the ones of the parent, copied by the fork
+WORKER_ROOT = "process._process_worker"
+
+
+def frame_name(code):
+    """
+    Name of a function in the stacks: module and qualified name, as "chessEngine.ChessEngine.negamax"
+    """
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return module + "." + getattr(code, "co_qualname", code.co_name)
+
+
+class Profiler():
+    def __init__(self, interval=0.001, hooks=True, all_threads=False):
+        """
+        Sampling profiler with timing hooks. start() and stop() can be called several times, the samples are added up
+        * interval: Seconds between samples. The sampling thread needs the GIL, so the switch interval of Python is
+        lowered to it while the profiler runs
+        * hooks: Wrap the methods of HOT_FUNCTIONS. They only add a counter and a clock to every call
+        * all_threads: Sample every thread (as the ones of minimax_root and of the UCI search) that isn't waiting (see
+        IDLE_MODULES), with the name of the thread at the bottom of its stacks. By default only the thread that calls start
+        is sampled
+        """
+        self.interval = interval
+        self.hooks = hooks
+        self.all_threads = all_threads
+
+        self.samples = {} # Collapsed stack -> samples
+        self.timings = {} # Hook name -> [calls, seconds]
+
+        self.originals = [] # (class, name, method) replaced by the hooks
+        self.wrapper_codes = set()
+        self.thread = None
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.start_time = 0
+        self.seconds = 0
+        self.switch_interval = sys.getswitchinterval()
+
+    def start(self, thread_id=None):
+        """
+        It starts sampling 'thread_id' (the thread that calls start, by default, see all_threads) and adds the hooks
+        """
+        if self.thread is not None:
+            return
+        if self.hooks:
+            self.add_hooks()
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stopped.clear()
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval))
+        self.start_time = time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self.seconds += time() - self.start_time
+        sys.setswitchinterval(self.switch_interval)
+        self.remove_hooks()
+
+    def add_hooks(self):
+        """
+        It wraps the methods of HOT_FUNCTIONS. A worker process started with fork gets the classes already wrapped by the
+        profiler of its parent: those hooks are replaced, not wrapped again
+        """
+        for cls, names in HOT_FUNCTIONS.items():
+            for name in names:
+                if name in vars(cls):
+                    method = vars(cls)[name]
+                    self.originals.append((cls, name, method))
+                    setattr(cls, name, self.hook(cls.__name__ + "." + name, getattr(method, "__wrapped__", method)))
+
+    def remove_hooks(self):
+        for cls, name, method in reversed(self.originals):
+            setattr(cls, name, method)
+        self.originals = []
+
+    def hook(self, name:str, function):
+        """
+        It returns 'function' adding its calls and its time to self.timings[name]
+        """
+        timing = self.timings.setdefault(name, [0, 0.0])
+
+        def wrapper(*args, **kwargs):
+            t = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timing[1] += perf_counter() - t
+                timing[0] += 1
+        wrapper.__wrapped__ = function
+        self.wrapper_codes.add(wrapper.__code__)
+        return wrapper
+
+    def run(self):
+        """
+        Sampling thread: the frames of the hooks are left out of the stacks, and in the worker processes the stacks start
+        at WORKER_ROOT
+        """
+        current_frames = sys._current_frames
+        samples = self.samples
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            if self.all_threads:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames = [(names.get(ident, str(ident)), frame) for ident, frame in current_frames().items() if ident != own_id]
+            else:
+                frames = [(None, current_frames().get(self.thread_id))]
+
+            for thread_name, frame in frames:
+                stack = []
+                while frame is not None:
+                    if frame.f_code not in self.wrapper_codes:
+                        stack.append(frame_name(frame.f_code))
+                        if stack[-1] == WORKER_ROOT:
+                            break
+                    frame = frame.f_back
+                if thread_name is not None:
+                    if not stack or stack[0].split(".")[0] in IDLE_MODULES:
+                        continue
+                    stack.append("thread " + thread_name.replace(" ", "_"))
+                if stack:
+                    key = ";".join(reversed(stack))
+                    samples[key] = samples.get(key, 0) + 1
+
+    def profile(self):
+        """
+        The profile as a dict that can be saved as JSON and merged with others (see merge_profiles)
+        """
+        seconds = self.seconds + (time() - self.start_time if self.thread is not None else 0)
+        return {"pids": [os.getpid()], "seconds": seconds, "samples": dict(self.samples),
+                "timings": {name: list(timing) for name, timing in self.timings.items()}}
+
+    def save(self, path:str):
+        with open(path, "w") as file:
+            json.dump(self.profile(), file)
+
+
+def merge_profiles(profiles):
+    """
+    It adds up several profiles (dicts of Profiler.profile, as the ones of the worker processes)
+    """
+    merged = {"pids": [], "seconds": 0, "samples": {}, "timings": {}}
+    for profile in profiles:
+        merged["pids"] += profile["pids"]
+        merged["seconds"] += profile["seconds"]
+        for stack, count in profile["samples"].items():
+            merged["samples"][stack] = merged["samples"].get(stack, 0) + count
+        for name, (calls, seconds) in profile["timings"].items():
+            timing = merged["timings"].setdefault(name, [0, 0.0])
+            timing[0] += calls
+            timing[1] += seconds
+    return merged
+
+
+def load_profiles(directory:str):
+    """
+    It returns the profiles saved in the directory (profile-<pid>.json, see ChessEngine.profile_dir)
+    """
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory, "profile-*.json"))):
+        with open(path) as file:
+            profiles.append(json.load(file))
+    return profiles
+
+
+def write_collapsed(profile:dict, path:str):
+    """
+    It writes the samples as collapsed stacks, the input of flamegraph.pl
+    """
+    with open(path, "w") as file:
+        for stack, count in sorted(profile["samples"].items()):
+            file.write(stack + " " + str(count) + "\n")
+
+
+def summary_table(profile:dict, limit=25):
+    """
+    It returns the table of the profile as text:
+    * By function: samples where it's running (self) and where it's in the stack (total), the 'limit' first by total
+    * The timing hooks: calls, seconds and microseconds per call
+    """
+    total_samples = sum(profile["samples"].values())
+    self_samples = {}
+    total = {}
+    for stack, count in profile["samples"].items():
+        functions = stack.split(";")
+        self_samples[functions[-1]] = self_samples.get(functions[-1], 0) + count
+        for function in set(functions):
+            total[function] = total.get(function, 0) + count
+
+    lines = ["Samples: {} Processes: {} Seconds: {:.2f}".format(total_samples, len(profile["pids"]), profile["seconds"]),
+             "{:>8} {:>7} {:>8} {:>7}  {}".format("self", "self %", "total", "total %", "function")]
+    for function, count in sorted(total.items(), key=lambda item: -item[1])[:limit]:
+        own = self_samples.get(function, 0)
+        lines.append("{:>8} {:>7.1%} {:>8} {:>7.1%}  {}".format(own, own / total_samples, count, count / total_samples, function))
+
+    if profile["timings"]:
+        lines += ["", "{:>10} {:>10} {:>10}  {}".format("calls", "seconds", "us/call", "hook")]
+        for name, (calls, seconds) in sorted(profile["timings"].items(), key=lambda item: -item[1][1]):
+            if calls == 0:
+                continue
+            lines.append("{:>10} {:>10.3f} {:>10.1f}  {}".format(calls, seconds, seconds / calls * 1e6 if calls else 0, name))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from chessEngine import ChessEngine
+
+    parser = argparse.ArgumentParser(description="Profile a search of the engine")
+    parser.add_argument("--fen", help="Position to search (the initial one by default)")
+    parser.add_argument("--depth", type=int, default=4, help="Depth of the search")
+    parser.add_argument("--mode", default="negamax", choices=["minimax", "negamax", "root", "ybwc", "lazy_smp"],
+                        help="Iterative deepening (minimax, negamax) or the parallel search of minimax_root with the worker processes")
+    parser.add_argument("--interval", type=float, default=0.001, help="Seconds between samples")
+    parser.add_argument("--no-hooks", action="store_true", help="Only sampling, without the timing hooks")
+    parser.add_argument("--mailbox", action="store_true", help="Use GameState instead of BitboardGameState")
+    parser.add_argument("--output", default="profile", help="Prefix of the files: <output>.collapsed, <output>.txt and the directory <output>_workers")
+    args = parser.parse_args()
+
+    game_class = GameState if args.mailbox else BitboardGameState
+    game = game_class.from_fen(args.fen) if args.fen else game_class()
+    parallel = args.mode in ("root", "ybwc", "lazy_smp")
+    engine = ChessEngine(game, parallel=args.mode if parallel else "root", search_mode="minimax" if parallel else args.mode)
+
+    profiles = []
+    # minimax_root runs in a thread of the module background
+    profiler = Profiler(args.interval, not args.no_hooks, all_threads=parallel)
+    if parallel:
+        engine.profile_dir = args.output + "_workers"
+        os.makedirs(engine.profile_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(engine.profile_dir, "profile-*.json")):
+            os.remove(path)
+
+    profiler.start()
+    t0 = time()
+    if parallel:
+        engine.minimax_root(args.depth, game).result()
+        move = engine.bestMove
+    else:
+        move, _, _, _ = engine.search(game, args.depth)
+    elapsed = time() - t0
+    profiler.stop()
+    engine.close() # The workers save their profiles after every task
+
+    profiles.append(profiler.profile())
+    if parallel:
+        profiles += load_profiles(engine.profile_dir)
+    profile = merge_profiles(profiles)
+
+    write_collapsed(profile, args.output + ".collapsed")
+    table = summary_table(profile)
+    with open(args.output + ".txt", "w") as file:
+        file.write(table + "\n")
+    print(table)
+    print("Move: {} Search time: {:.2f} s".format(move, elapsed))
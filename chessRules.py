@@ -1,7 +1,60 @@
 from time import time
-from copy import deepcopy
+from random import Random
+
+from chessTables import MATERIAL_SCORES, POSITION_SCORES
+
+ROOK_DIRS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+KNIGHT_JUMPS = ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1))
+
+
+def jump_targets(jumps):
+    """
+    It returns a list with the squares (y, x) reached from every square (y*8 + x) with the jumps (dy, dx)
+    """
+    return [tuple((y+dy, x+dx) for dy, dx in jumps if 0 <= y+dy <= 7 and 0 <= x+dx <= 7) for y in range(8) for x in range(8)]
+
+def ray_squares(y, x, dy, dx):
+    """
+    It returns the squares (y, x) from the square (y, x) to the edge of the board in the direction (dy, dx)
+    """
+    squares = []
+    y, x = y+dy, x+dx
+    while 0 <= y <= 7 and 0 <= x <= 7:
+        squares.append((y, x))
+        y, x = y+dy, x+dx
+    return tuple(squares)
+
+
+# Attack tables, by square (y*8 + x), used by is_square_attacked and calc_checks_and_pins:
+# * The squares a knight or a king attacks (the attacks go both ways)
+# * The squares where a pawn of the player attacks the square from
+# * The rays of every direction: ((dy, dx), squares from the nearest to the edge), the empty ones aren't kept
+KNIGHT_TARGETS = jump_targets(KNIGHT_JUMPS)
+KING_TARGETS = jump_targets(ROOK_DIRS + BISHOP_DIRS)
+PAWN_ATTACKERS = {"w": jump_targets(((1, 1), (1, -1))), "b": jump_targets(((-1, 1), (-1, -1)))}
+RAYS = [tuple((d, ray_squares(y, x, *d)) for d in ROOK_DIRS + BISHOP_DIRS if ray_squares(y, x, *d)) for y in range(8) for x in range(8)]
+
+# Random numbers of the Zobrist hashing. The seed is fixed, so the keys are the same in every process and session
+zobrist_random = Random(20220101)
+ZOBRIST_PIECES = {p+piece: [zobrist_random.getrandbits(64) for _ in range(64)] for p in "wb" for piece in "pNBRQK"}
+ZOBRIST_BLACK_TURN = zobrist_random.getrandbits(64)
+ZOBRIST_ENROC = [zobrist_random.getrandbits(64) for _ in range(4)] # w_l, w_r, b_l, b_r
+ZOBRIST_ENPASSANT = [zobrist_random.getrandbits(64) for _ in range(8)] # One for every column
+
+# Moves of the move_log kept by get_position and copy (the repetitions are detected with the key_history, see repetitions)
+HISTORY_MOVES = 10
+
+# Packed moves (see Move.pack): the squares are the 12 lowest bits, (from square << 6) | to square, and the flags go over them
+PACKED_SQUARES = 0xfff
+PACKED_PASO = 1 << 12
+PACKED_ENROC = 1 << 13
+PACKED_PROMOTION = 1 << 14
 
 class Move():
+    # Without __dict__ every move takes less memory and is created faster (the generators create thousands of them)
+    __slots__ = ("x0", "y0", "x1", "y1", "piece", "piece_capt", "paso", "promotion", "enroc", "check")
+
     def __init__(self, y0, x0, y1, x1, piece="--", piece_capt="--", paso=False, enroc=False, check=False, promotion=False):
         self.x0 = x0
         self.y0 = y0
@@ -15,20 +68,76 @@ class Move():
         self.enroc = enroc
         self.check = check
 
-    def __eq__(self, *args):
-        return (self.x0, self.y0, self.x1, self.y1, self.piece)
+    def __eq__(self, other):
+        """
+        Two moves are the same if they go from and to the same squares. In a position there's only one move like that,
+        the promotions are always to a queen
+        """
+        if not isinstance(other, Move):
+            return NotImplemented
+        return self.y0 == other.y0 and self.x0 == other.x0 and self.y1 == other.y1 and self.x1 == other.x1
+
+    def __hash__(self):
+        """
+        The squares of the move: (from square << 6) | to square, with the squares as y*8 + x
+        """
+        return ((self.y0*8 + self.x0) << 6) | (self.y1*8 + self.x1)
+
+    def __repr__(self):
+        return "Move({}, {}, {}, {}, {!r})".format(self.y0, self.x0, self.y1, self.x1, self.piece)
+
+    def pack(self):
+        """
+        It returns the move as a 15 bits integer: the squares (as in __hash__) and the flags PACKED_PASO, PACKED_ENROC
+        and PACKED_PROMOTION. The pieces aren't kept, they are in the board (see unpack)
+        """
+        packed = ((self.y0*8 + self.x0) << 6) | (self.y1*8 + self.x1)
+        if self.paso:
+            packed |= PACKED_PASO
+        if self.enroc:
+            packed |= PACKED_ENROC
+        if self.piece[1] == "p" and self.y1 in (0, 7):
+            packed |= PACKED_PROMOTION
+        return packed
+
+    @classmethod
+    def unpack(cls, packed:int, game):
+        """
+        It returns the Move of a packed move (see pack) in the position of 'game', taking the pieces from its board.
+        It doesn't check if the move is legal
+        """
+        from_sq, to_sq = (packed >> 6) & 0x3f, packed & 0x3f
+        y0, x0, y1, x1 = from_sq >> 3, from_sq & 7, to_sq >> 3, to_sq & 7
+        enroc = ("l" if x1 < x0 else "r") if packed & PACKED_ENROC else False
+        return cls(y0, x0, y1, x1, game.board[y0][x0], game.board[y1][x1], paso=bool(packed & PACKED_PASO), enroc=enroc)
 
 
 class GameState():
     def __init__(self):
-        self.board = [["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-                      ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
-                      ["--", "--", "--", "--", "--", "--", "--", "--"],
-                      ["--", "--", "--", "--", "--", "--", "--", "--"],
-                      ["--", "--", "--", "--", "--", "--", "--", "--"],
-                      ["--", "--", "--", "--", "--", "--", "--", "--"],
-                      ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
-                      ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
+        # 64 bits key of the position, kept updated by set_square, makeMove and undoMove
+        self.zobrist = 0
+
+        # Running scores of the evaluation (see GameEval.eval_pos), kept updated by set_square:
+        # material and piece-square tables (white positive), and the squares (y, x) of the pawns of every player
+        self.material_score = 0
+        self.position_score = 0
+        self.pawns_pos = {"wp": set(), "bp": set()}
+
+        # Piece lists, kept updated by set_square: the squares (y, x) of the pieces of every player, the square of every king
+        # (None if there isn't) and the number of pieces of every type
+        self.piece_squares = {"w": set(), "b": set()}
+        self.king_squares = {"w": None, "b": None}
+        self.piece_counts = {p+piece: 0 for p in "wb" for piece in "pNBRQK"}
+
+        self.board = [["--"] * 8 for _ in range(8)]
+        self.load_board([["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+                         ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+                         ["--", "--", "--", "--", "--", "--", "--", "--"],
+                         ["--", "--", "--", "--", "--", "--", "--", "--"],
+                         ["--", "--", "--", "--", "--", "--", "--", "--"],
+                         ["--", "--", "--", "--", "--", "--", "--", "--"],
+                         ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+                         ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]])
 
         # Vars to control the castling
         self.w_l_enroc = 0
@@ -36,12 +145,24 @@ class GameState():
         self.b_l_enroc = 0
         self.b_r_enroc = 0
 
+        # Var to control the 'en passant' (the square the pawn has jumped over, or None)
+        self.enpassant_square = None
+        self.enpassant_log = []
+
         #Other pieces vars
         self.blocked_pawns = 0
 
         # Var to control the player's turn
         self.isWhiteTurn = True
 
+        # Counters of the FEN: moves since the last capture or pawn move, and number of the move (it starts at 1, +1 after black moves)
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.halfmove_log = []
+
+        # Zobrist keys of the positions before every move, to detect the repetitions (see repetitions)
+        self.key_history = []
+
         # Vars to control the game state
         self.theresCheck = False
         self.theresCheckMate = False
@@ -49,101 +170,493 @@ class GameState():
 
         # Vars to keep track of the legal moves
         self.legal_moves = []
-        self.other_moves = []
         self.ant_move = ""
         self.move_log = []
         self.moves_undoded = []
+
+        # States before the null moves (see makeNullMove)
+        self.null_log = []
         
+        self.zobrist = self.calc_zobrist_key()
+
         #Calculate the first legal moves
         self.calc_legal_moves()
 
+    def load_board(self, board):
+        """
+        It puts the pieces of 'board' (a list of 8 lists of 8 strings) one by one, emptying the rest of the squares.
+        """
+        for y in range(8):
+            for x in range(8):
+                self.set_square(y, x, board[y][x])
+
+    def set_square(self, y, x, piece):
+        """
+        It puts the piece in the square (y, x). Use "--" to empty the square.
+        * Every change of the board is done through this method, so the subclasses can keep their own representations updated
+        """
+        sq = y*8 + x
+        old = self.board[y][x]
+        if old != "--":
+            self.zobrist ^= ZOBRIST_PIECES[old][sq]
+            self.material_score -= MATERIAL_SCORES[old]
+            self.position_score -= POSITION_SCORES[old][sq]
+            self.piece_squares[old[0]].discard((y, x))
+            self.piece_counts[old] -= 1
+            if old[1] == "p":
+                self.pawns_pos[old].discard((y, x))
+            elif old[1] == "K" and self.king_squares[old[0]] == (y, x):
+                self.king_squares[old[0]] = None
+        if piece != "--":
+            self.zobrist ^= ZOBRIST_PIECES[piece][sq]
+            self.material_score += MATERIAL_SCORES[piece]
+            self.position_score += POSITION_SCORES[piece][sq]
+            self.piece_squares[piece[0]].add((y, x))
+            self.piece_counts[piece] += 1
+            if piece[1] == "p":
+                self.pawns_pos[piece].add((y, x))
+            elif piece[1] == "K":
+                self.king_squares[piece[0]] = (y, x)
+        self.board[y][x] = piece
+
+    @property
+    def zobrist_key(self):
+        """
+        The Zobrist key of the position: pieces, player's turn, castling and 'en passant'
+        """
+        return self.zobrist
+
+    def zobrist_state(self):
+        """
+        It returns the part of the Zobrist key that doesn't depend on the pieces: turn, castling and 'en passant'
+        * The 'en passant' only counts if there's a pawn that could capture, so the same position gets the same key
+        """
+        key = 0 if self.isWhiteTurn else ZOBRIST_BLACK_TURN
+        for i, counter in enumerate((self.w_l_enroc, self.w_r_enroc, self.b_l_enroc, self.b_r_enroc)):
+            if counter == 0:
+                key ^= ZOBRIST_ENROC[i]
+
+        if self.enpassant_square:
+            y, x = self.enpassant_square
+            pawn = "wp" if self.isWhiteTurn else "bp"
+            y += 1 if self.isWhiteTurn else -1
+            if (x > 0 and self.board[y][x-1] == pawn) or (x < 7 and self.board[y][x+1] == pawn):
+                key ^= ZOBRIST_ENPASSANT[x]
+
+        return key
+
+    def calc_zobrist_key(self):
+        """
+        It calculates the Zobrist key from scratch (to initialise it and to verify the updated one)
+        """
+        key = self.zobrist_state()
+        for y in range(8):
+            for x, piece in enumerate(self.board[y]):
+                if piece != "--":
+                    key ^= ZOBRIST_PIECES[piece][y*8 + x]
+        return key
+
+    def get_position(self):
+        """
+        It returns the position as a small tuple, cheap to send to another process:
+        * The board as a string of 128 chars (2 for every square)
+        * The turn, the castling counters and the 'en passant' square
+        * The last HISTORY_MOVES moves
+        * The halfmove clock and the fullmove number
+        * The keys of the positions since the last capture or pawn move, needed to detect the repetitions (see repetitions)
+        """
+        return ("".join("".join(row) for row in self.board), self.isWhiteTurn,
+                (self.w_l_enroc, self.w_r_enroc, self.b_l_enroc, self.b_r_enroc),
+                self.enpassant_square, self.move_log[-HISTORY_MOVES:], (self.halfmove_clock, self.fullmove_number),
+                self.reversible_keys())
+
+    def set_position(self, position):
+        """
+        It loads a position returned by get_position, so the same GameState can be reused for many positions.
+        * The moves before the position can't be undone
+        """
+        board, self.isWhiteTurn, enroc, self.enpassant_square, moves, counters, keys = position
+        self.load_board([[board[2*(y*8 + x):2*(y*8 + x) + 2] for x in range(8)] for y in range(8)])
+        self.w_l_enroc, self.w_r_enroc, self.b_l_enroc, self.b_r_enroc = enroc
+        self.halfmove_clock, self.fullmove_number = counters
+
+        self.enpassant_log = []
+        self.halfmove_log = []
+        self.null_log = []
+        self.move_log = list(moves)
+        self.moves_undoded = []
+        self.ant_move = moves[-1] if moves else ""
+        self.key_history = list(keys)
+
+        self.theresCheck = False
+        self.theresCheckMate = False
+        self.theresDraw = False
+
+        self.zobrist = self.calc_zobrist_key()
+        self.calc_legal_moves()
+
+    def copy(self):
+        """
+        It returns a new game with the same position, much cheaper than deepcopy (used by the search before playing the moves):
+        * The board, the running scores, the piece lists, the turn, the castling, the 'en passant' and the counters are copied
+        * The move_log keeps the last HISTORY_MOVES moves and the key_history the keys since the last capture or pawn move,
+        as get_position. The moves before the copy can't be undone
+        * The Move objects of the logs and the legal moves are shared, they aren't changed once played
+        * The subclasses copy their own representations of the board (see BitboardGameState.copy)
+        """
+        game = self.__class__.__new__(self.__class__)
+        game.__dict__.update(self.__dict__)
+
+        game.board = [row[:] for row in self.board]
+        game.pawns_pos = {"wp": set(self.pawns_pos["wp"]), "bp": set(self.pawns_pos["bp"])}
+        game.piece_squares = {"w": set(self.piece_squares["w"]), "b": set(self.piece_squares["b"])}
+        game.king_squares = dict(self.king_squares)
+        game.piece_counts = dict(self.piece_counts)
+
+        game.legal_moves = list(self.legal_moves)
+        game.move_log = self.move_log[-HISTORY_MOVES:]
+        game.key_history = self.reversible_keys()
+        game.moves_undoded = []
+        game.enpassant_log = []
+        game.halfmove_log = []
+        game.null_log = []
+        return game
+
+    def reversible_keys(self):
+        """
+        It returns the keys of the key_history since the last capture or pawn move, the only positions that can be repeated
+        """
+        if self.halfmove_clock == 0:
+            return []
+        return self.key_history[-self.halfmove_clock:]
+
+    def repetitions(self):
+        """
+        It returns how many times the current position was reached before (the same Zobrist key with the same player to move).
+        * Only the positions since the last capture or pawn move (halfmove_clock) are looked at, one of every two
+        * A position can't be repeated 2 plies later, so the first one looked at is 4 plies back
+        """
+        history = self.key_history
+        key = self.zobrist
+        count = 0
+        for i in range(4, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-i] == key:
+                count += 1
+        return count
+
+    @property
+    def insufficient_material(self):
+        """
+        It tells if no player can checkmate, with the piece lists kept by set_square: only the kings and one knight or bishop,
+        or a bishop each one in squares of the same colour
+        """
+        pieces = len(self.piece_squares["w"]) + len(self.piece_squares["b"])
+        if pieces > 4:
+            return False
+        counts = self.piece_counts
+        if pieces <= 2:
+            return True
+        if pieces == 3:
+            return counts["wN"] + counts["bN"] + counts["wB"] + counts["bB"] == 1
+        if counts["wB"] == 1 and counts["bB"] == 1:
+            colours = {(y + x) % 2 for p in "wb" for y, x in self.piece_squares[p] if self.board[y][x][1] == "B"}
+            return len(colours) == 1
+        return False
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        It returns a new game with the position of the FEN string: https://www.chessprogramming.org/Forsyth-Edwards_Notation
+        * It works with the subclasses too (BitboardGameState.from_fen)
+        """
+        game = cls()
+        game.set_fen(fen)
+        return game
+
+    def set_fen(self, fen):
+        """
+        It loads the position of the FEN string: pieces, turn, castling, 'en passant' square and move counters.
+        The move counters are optional (as in the EPD)
+        * The castling is allowed only if the king and the rook are in their squares
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError("FEN with less than 4 fields: " + fen)
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError("FEN without 8 rows: " + fen)
+
+        board = ""
+        for row in rows:
+            squares = ""
+            for char in row:
+                if char.isdigit():
+                    squares += "--" * int(char)
+                elif char.lower() in "pnbrqk":
+                    squares += ("w" if char.isupper() else "b") + (char.upper() if char.lower() != "p" else "p")
+                else:
+                    raise ValueError("FEN with an unknown piece '" + char + "': " + fen)
+            if len(squares) != 16:
+                raise ValueError("FEN with a row without 8 squares: " + fen)
+            board += squares
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError("FEN with an unknown turn: " + fen)
+
+        enroc = []
+        for char, king, rook in (("Q", 120, 112), ("K", 120, 126), ("q", 8, 0), ("k", 8, 14)): # w_l, w_r, b_l, b_r
+            p = "w" if char.isupper() else "b"
+            allowed = char in fields[2] and board[king:king+2] == p + "K" and board[rook:rook+2] == p + "R"
+            enroc.append(0 if allowed else 1)
+
+        enpassant_square = None
+        if fields[3] != "-":
+            enpassant_square = (8 - int(fields[3][1]), "abcdefgh".index(fields[3][0]))
+
+        halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+
+        self.set_position((board, fields[1] == "w", tuple(enroc), enpassant_square, [], (halfmove_clock, fullmove_number), []))
+
+    def to_fen(self):
+        """
+        It returns the FEN string of the position
+        """
+        rows = []
+        for row in self.board:
+            fen_row = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    fen_row += str(empty)
+                    empty = 0
+                fen_row += piece[1].upper() if piece[0] == "w" else piece[1].lower()
+            if empty:
+                fen_row += str(empty)
+            rows.append(fen_row)
+
+        castling = ""
+        for char, counter in (("K", self.w_r_enroc), ("Q", self.w_l_enroc), ("k", self.b_r_enroc), ("q", self.b_l_enroc)):
+            if counter == 0:
+                castling += char
+
+        enpassant = "-"
+        if self.enpassant_square:
+            y, x = self.enpassant_square
+            enpassant = "abcdefgh"[x] + str(8 - y)
+
+        return " ".join(("/".join(rows), "w" if self.isWhiteTurn else "b", castling or "-", enpassant,
+                         str(self.halfmove_clock), str(self.fullmove_number)))
+
 
     def calc_legal_moves(self):
         """
         * It calculates the legal moves of the current player (self.isWhiteTurn)
         * It stores the value in the list self.legal_moves
+        * The checkers and the pinned pieces are calculated once from the king, and the squares of the king moves are tested with
+          is_square_attacked, so no move has to be tried
         """
+        king_pos, p = self.calc_kings_position(False)
+        c = "b" if p == "w" else "w"
+        checkers, block_squares, pins = self.calc_checks_and_pins(king_pos, p, c)
+        self.theresCheck = len(checkers) > 0
+
         self.legal_moves = []
 
-        # Calculate all the possible moves for the current player
-        for i in range(8):
-            for j, piece in enumerate(self.board[i]):
-                if piece == "--":
+        # With a double check only the king can move
+        if len(checkers) < 2:
+            ky, kx = king_pos
+            for move in self.calc_pseudo_moves():
+                if (move.y0, move.x0) in pins:
+                    # A pinned piece can only move in the line of the pin
+                    dy, dx = pins[(move.y0, move.x0)]
+                    if (move.y1 - ky) * dx != (move.x1 - kx) * dy:
+                        continue
+
+                if move.paso:
+                    capt = (move.y0, move.x1)
+                    if checkers and capt not in block_squares and (move.y1, move.x1) not in block_squares:
+                        continue
+                    # The two pawns leave the row at the same time, it could uncover the king
+                    if self.line_attacked(king_pos, c, ((move.y0, move.x0), capt), ((move.y1, move.x1),)):
+                        continue
+
+                elif checkers and (move.y1, move.x1) not in block_squares:
                     continue
-                elif piece[1] == "p":
-                    self.legal_moves += self.pawns_movement(True, i, j, piece)
-                elif piece[1] == "N":
-                    self.legal_moves += self.knight_movement(True, i, j, piece)
-                elif piece[1] == "R":
-                    self.legal_moves += self.r_b_Q_movements("R", (1, -1, 0, 0), (0, 0, 1, -1), True, i, j, piece)
-                elif piece[1] == "B":
-                    self.legal_moves += self.r_b_Q_movements("B", (1, -1, 1, -1), (1, -1, -1, 1), True, i, j, piece)
-                elif piece[1] == "Q":
-                    self.legal_moves += self.r_b_Q_movements("Q", (1, -1, 0, 0), (0, 0, 1, -1), True, i, j, piece)
-                    self.legal_moves += self.r_b_Q_movements("Q", (1, -1, 1, -1), (1, -1, -1, 1), True, i, j, piece)
-            
-        self.isWhiteTurn = not self.isWhiteTurn
-        self.calc_others_legal_moves() #Calculate all the squares where the opponent can capture
-        current_other_moves = deepcopy(self.other_moves)
-        self.isWhiteTurn = not self.isWhiteTurn
+
+                self.legal_moves.append(move)
+
+        # The king can't go to an attacked square (the king itself doesn't block the lines, so it can't step back in the line of a check)
+        for move in self.king_movement():
+            if not self.is_square_attacked((move.y1, move.x1), c, king_pos):
+                self.legal_moves.append(move)
+        if not checkers:
+            self.legal_moves += self.castling_moves(c)
+
+        self.check_checkMate()
+        self.check_draw()
+
+    def calc_pseudo_moves(self):
+        """
+        It returns the moves of the current player without looking if they leave the king in check (nor the king moves)
+        * Only the squares of the pieces of the player are visited (see piece_squares)
+        """
+        moves = []
+        board = self.board
+        for i, j in self.piece_squares["w" if self.isWhiteTurn else "b"]:
+            piece = board[i][j]
+            if piece[1] == "p":
+                moves += self.pawns_movement(i, j, piece)
+            elif piece[1] == "N":
+                moves += self.knight_movement(i, j, piece)
+            elif piece[1] == "R":
+                moves += self.r_b_Q_movements("R", (1, -1, 0, 0), (0, 0, 1, -1), i, j, piece)
+            elif piece[1] == "B":
+                moves += self.r_b_Q_movements("B", (1, -1, 1, -1), (1, -1, -1, 1), i, j, piece)
+            elif piece[1] == "Q":
+                moves += self.r_b_Q_movements("Q", (1, -1, 0, 0), (0, 0, 1, -1), i, j, piece)
+                moves += self.r_b_Q_movements("Q", (1, -1, 1, -1), (1, -1, -1, 1), i, j, piece)
+        return moves
+
+    def calc_checks_and_pins(self, king_pos, p, c):
+        """
+        Looking from the king of 'p', it returns:
+        * The squares of the pieces of 'c' that are giving check
+        * The squares where a piece can go to stop the check (the checker and the squares between it and the king)
+        * A dict with the pinned pieces of 'p': square -> direction (dy, dx) of the pin
+        """
+        ky, kx = king_pos
+        checkers = []
+        block_squares = set()
+        pins = {}
+
+        board = self.board
+        sq = ky*8 + kx
+        for attackers, piece in ((KNIGHT_TARGETS, c+"N"), (PAWN_ATTACKERS[c], c+"p")):
+            for i, j in attackers[sq]:
+                if board[i][j] == piece:
+                    checkers.append((i, j))
+                    block_squares.add((i, j))
+
+        for (dy, dx), ray in RAYS[sq]:
+            sliders = (c+"R", c+"Q") if dy == 0 or dx == 0 else (c+"B", c+"Q")
+            path = []
+            pinned = None
+            for i, j in ray:
+                piece = board[i][j]
+                if piece == "--":
+                    path.append((i, j))
+                elif piece[0] == p:
+                    if pinned:
+                        break
+                    pinned = (i, j)
+                else:
+                    if piece in sliders:
+                        if pinned:
+                            pins[pinned] = (dy, dx)
+                        else:
+                            checkers.append((i, j))
+                            block_squares.update(path)
+                            block_squares.add((i, j))
+                    break
+
+        return checkers, block_squares, pins
+
+    def is_square_attacked(self, square, by_colour, ignored=None):
+        """
+        It checks if a piece of the player 'by_colour' attacks the square (y, x), looking from the square with the attack tables
+        (KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKERS and RAYS) instead of generating the moves of the player
+        * ignored: A square (y, x) whose piece doesn't block the lines (the king that is moving)
+        """
+        board = self.board
+        sq = square[0]*8 + square[1]
+        for attackers, piece in ((KNIGHT_TARGETS, by_colour+"N"), (PAWN_ATTACKERS[by_colour], by_colour+"p"), (KING_TARGETS, by_colour+"K")):
+            for y, x in attackers[sq]:
+                if board[y][x] == piece:
+                    return True
+
+        rooks = (by_colour+"R", by_colour+"Q")
+        bishops = (by_colour+"B", by_colour+"Q")
+        for (dy, dx), ray in RAYS[sq]:
+            for y, x in ray:
+                piece = board[y][x]
+                if piece != "--" and (y, x) != ignored:
+                    if piece in (rooks if dy == 0 or dx == 0 else bishops):
+                        return True
+                    break
+        return False
+
+    def line_attacked(self, square, c, emptied=(), filled=()):
+        """
+        It checks if a rook, bishop or queen of 'c' attacks the square, as if the squares of 'emptied' were empty and the ones of 'filled' weren't
+        """
+        y, x = square
+        for (dy, dx), ray in RAYS[y*8 + x]:
+            sliders = (c+"R", c+"Q") if dy == 0 or dx == 0 else (c+"B", c+"Q")
+            for i, j in ray:
+                if (i, j) in filled:
+                    break
+                piece = self.board[i][j]
+                if piece != "--" and (i, j) not in emptied:
+                    if piece in sliders:
+                        return True
+                    break
+        return False
+
+    def castling_moves(self, c):
+        """
+        If possible, it returns the castle moves. The king can't be in check (it's not checked here) nor pass through a square attacked by 'c'
+        """
+        p = "w" if self.isWhiteTurn else "b"
+        y = 7 if p == "w" else 0
+        movements = []
+
+        left, right = (self.w_l_enroc, self.w_r_enroc) if p == "w" else (self.b_l_enroc, self.b_r_enroc)
+        if left == 0 and self.board[y][0] == p+"R" and self.board[y][1] == self.board[y][2] == self.board[y][3] == "--":
+            if not self.is_square_attacked((y, 3), c) and not self.is_square_attacked((y, 2), c):
+                movements.append(Move(y, 4, y, 2, p+"K", enroc="l"))
+        if right == 0 and self.board[y][7] == p+"R" and self.board[y][5] == self.board[y][6] == "--":
+            if not self.is_square_attacked((y, 5), c) and not self.is_square_attacked((y, 6), c):
+                movements.append(Move(y, 4, y, 6, p+"K", enroc="r"))
+
+        return movements
+
+    def calc_legal_moves_reference(self):
+        """
+        * The first (and slow) way of calculating the legal moves: every move that can leave the king in check is tried
+        * It's kept to verify calc_legal_moves, both store the value in the list self.legal_moves
+        """
+        self.legal_moves = self.calc_pseudo_moves()
 
         # Make sure there's no illegal move
-        self.legal_moves += self.check_king_movement(self.other_moves)
+        self.legal_moves += self.check_king_movement()
         king_pos, p = self.calc_kings_position(False)
-        self.check_check(self.other_moves, king_pos, p)
+        self.check_check(king_pos, p)
+        in_check = self.theresCheck
 
         #Del moves that are suited by check
         to_del = []
         for i, move in enumerate(self.legal_moves):
-            if (move.y0 == king_pos[0] or move.x0 == king_pos[1]) or abs(move.y0-king_pos[0]) == abs(move.x0-king_pos[1]) or self.theresCheck:
+            if (move.y0 == king_pos[0] or move.x0 == king_pos[1]) or abs(move.y0-king_pos[0]) == abs(move.x0-king_pos[1]) or in_check:
                 self.makeMove(move, flag=False)
-                self.calc_others_legal_moves()
-                if move.piece[1] == "K":
-                    king_pos, p = self.calc_kings_position(True)
-                self.check_check(self.other_moves, king_pos, p)
+                moved_king_pos, _ = self.calc_kings_position(True)
+                self.check_check(moved_king_pos, p)
                 if self.theresCheck:
                     to_del.append(i)
                 self.undoMove(flag=False)
-                if move.piece[1] == "K":
-                    king_pos, p = self.calc_kings_position(False)
-                self.other_moves = current_other_moves
-                self.check_check(self.other_moves, king_pos, p)
 
         for i, j in enumerate(to_del):
             del self.legal_moves[-i+j]
         
         # Check checks
-        self.other_moves = current_other_moves
-        king_pos, p = self.calc_kings_position(False)
-        self.check_check(self.other_moves, king_pos, p)
+        self.check_check(king_pos, p)
 
         self.check_checkMate()
         self.check_draw()
 
-    def calc_others_legal_moves(self):
-        """
-        * It calculates the legal moves of the other player (not self.isWhiteTurn)
-        * It stores the value in the list self.other_moves
-        """
-        self.other_moves = []
-        for i in range(8):
-            for j, piece in enumerate(self.board[i]):
-                if piece == "--":
-                    continue
-                elif piece[1] == "p":
-                    self.other_moves += self.pawns_movement(False, i, j, piece)
-                elif piece[1] == "N":
-                    self.other_moves += self.knight_movement(False, i, j, piece)
-                elif piece[1] == "R":
-                    self.other_moves += self.r_b_Q_movements("R", (1, -1, 0, 0), (0, 0, 1, -1), False, i, j, piece)
-                elif piece[1] == "B":
-                    self.other_moves += self.r_b_Q_movements("B", (1, -1, 1, -1), (1, -1, -1, 1), False, i, j, piece)
-                elif piece[1] == "Q":
-                    self.other_moves += self.r_b_Q_movements("Q", (1, -1, 0, 0), (0, 0, 1, -1), False, i, j, piece)
-                    self.other_moves += self.r_b_Q_movements("Q", (1, -1, 1, -1), (1, -1, -1, 1), False, i, j, piece)
-        self.other_moves += self.king_movement(False)
-
-
     def makeMove(self, move:Move, undoing=False, flag=True, engine=False):
         """
         It performs the move, updating all the variables that are crucial to update
@@ -151,12 +664,15 @@ class GameState():
         * The flag also is used to know whether the movement was done by the player or the chessRules module
         * Undoing is set to True if the player is un_undoing the move
         """
+        self.key_history.append(self.zobrist)
+        self.zobrist ^= self.zobrist_state()
+
         piece = self.board[move.y0][move.x0]
         piece_capt = self.board[move.y1][move.x1]
         move.piece = piece
         move.piece_capt = piece_capt
-        self.board[move.y0][move.x0] = "--"
-        self.board[move.y1][move.x1] = piece
+        self.set_square(move.y0, move.x0, "--")
+        self.set_square(move.y1, move.x1, piece)
 
         move.check = self.theresCheck
         
@@ -165,7 +681,7 @@ class GameState():
 
         if move.paso:
             dir_ = 1 if self.isWhiteTurn else -1
-            self.board[move.y1+dir_][move.x1] = "--"
+            self.set_square(move.y1+dir_, move.x1, "--")
 
 
         if move.enroc:
@@ -173,11 +689,25 @@ class GameState():
             posx = 0 if move.enroc=="l" else 7
             posy = 7 if self.isWhiteTurn else 0
             p = "w" if self.isWhiteTurn else "b"
-            self.board[posy][posx] = "--"
-            self.board[posy][posx+dir_] = p + "R"
+            self.set_square(posy, posx, "--")
+            self.set_square(posy, posx+dir_, p + "R")
     
         self.check_enroc(False, move)
 
+        self.halfmove_log.append(self.halfmove_clock)
+        if piece[1] == "p" or piece_capt != "--":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece[0] == "b":
+            self.fullmove_number += 1
+
+        self.enpassant_log.append(self.enpassant_square)
+        if piece[1] == "p" and abs(move.y1 - move.y0) == 2:
+            self.enpassant_square = ((move.y0 + move.y1) // 2, move.x0)
+        else:
+            self.enpassant_square = None
+
 
         self.ant_move = move
         if flag or engine:
@@ -190,6 +720,8 @@ class GameState():
         self.theresCheck = False
         self.isWhiteTurn = not self.isWhiteTurn
 
+        self.zobrist ^= self.zobrist_state()
+
 
         if flag:
             self.calc_legal_moves()
@@ -207,14 +739,16 @@ class GameState():
             else:
                 move:Move = self.ant_move
 
-            self.board[move.y1][move.x1] = move.piece_capt
-            self.board[move.y0][move.x0] = move.piece
+            self.zobrist ^= self.zobrist_state()
+
+            self.set_square(move.y1, move.x1, move.piece_capt)
+            self.set_square(move.y0, move.x0, move.piece)
 
 
             if move.paso:
                 p = "b" if move.piece[0]=="w" else "w"
                 dir_ = 1 if p=="b" else -1
-                self.board[move.y1+dir_][move.x1] = p+"p"
+                self.set_square(move.y1+dir_, move.x1, p+"p")
 
 
             if move.enroc:
@@ -222,10 +756,15 @@ class GameState():
                 posx = 0 if move.enroc=="l" else 7
                 posy = 7 if move.piece[0]=="w" else 0
                 p = "w" if move.piece[0]=="w" else "b"
-                self.board[posy][posx] = p + "R"
-                self.board[posy][move.x1+dir_] = "--"
+                self.set_square(posy, posx, p + "R")
+                self.set_square(posy, move.x1+dir_, "--")
 
             self.check_enroc(True, move)
+            self.enpassant_square = self.enpassant_log.pop()
+            self.halfmove_clock = self.halfmove_log.pop()
+            self.key_history.pop()
+            if move.piece[0] == "b":
+                self.fullmove_number -= 1
 
 
             if flag or engine:
@@ -238,10 +777,44 @@ class GameState():
             self.theresDraw = False
             self.isWhiteTurn = not self.isWhiteTurn
 
+            self.zobrist ^= self.zobrist_state()
+
 
             if flag:
                 self.calc_legal_moves()
 
+    def makeNullMove(self):
+        """
+        It passes the turn without moving (for the null move pruning of the engine).
+        * The 'en passant' is lost, as after any other move
+        * The move isn't stored in the move_log
+        * The positions before it don't count as repetitions (the halfmove clock starts again)
+        """
+        self.null_log.append((self.enpassant_square, self.legal_moves, self.theresCheck, self.theresCheckMate, self.theresDraw,
+                              self.halfmove_clock))
+
+        self.key_history.append(self.zobrist)
+        self.halfmove_clock = 0
+        self.zobrist ^= self.zobrist_state()
+        self.enpassant_square = None
+        self.isWhiteTurn = not self.isWhiteTurn
+        self.zobrist ^= self.zobrist_state()
+
+        self.theresCheck = False
+        self.theresCheckMate = False
+        self.theresDraw = False
+        self.calc_legal_moves()
+
+    def undoNullMove(self):
+        """
+        It undoes the last null move. The legal moves are restored, not calculated again
+        """
+        self.zobrist ^= self.zobrist_state()
+        self.enpassant_square, self.legal_moves, self.theresCheck, self.theresCheckMate, self.theresDraw, self.halfmove_clock = self.null_log.pop()
+        self.key_history.pop()
+        self.isWhiteTurn = not self.isWhiteTurn
+        self.zobrist ^= self.zobrist_state()
+
     def un_undoMove(self):
         """
         To un_undo the move.
@@ -252,133 +825,92 @@ class GameState():
             del self.moves_undoded[-1]
 
 
-    def pawns_movement(self, flag, i, j, piece):
+    def pawns_movement(self, i, j, piece):
         """
         It computes the pawn's movement and returns them (a list of 'Move')
-        * Flag: It is used to determine wheter the pawns are used by the player or to check that the other is not doing check.
         """
         p = "w" if self.isWhiteTurn else "b" #Define the player
         c = "b" if p == "w" else "w"
         dirs = -1 if p=="w" else 1
         pos_0 = 6 if p=="w" else 1
-        paso = 3 if p=="w" else 4
 
         movements = []
 
         if piece == p+"p":
-            
-            if flag:
-                self.blocked_pawns = 0
+            self.blocked_pawns = 0
 
-                if self.board[i + dirs][j] == "--": #Move 1 forward
-                    movements.append(Move(i, j, i+dirs, j, p+"p"))
+            if self.board[i + dirs][j] == "--": #Move 1 forward
+                movements.append(Move(i, j, i+dirs, j, p+"p"))
 
-                    if i == pos_0:
-                        if self.board[i + 2*dirs][j] == "--": #Move 2 forawrd
-                            movements.append(Move(i, j, i+2*dirs, j, p+"p"))
+                if i == pos_0:
+                    if self.board[i + 2*dirs][j] == "--": #Move 2 forawrd
+                        movements.append(Move(i, j, i+2*dirs, j, p+"p"))
 
-                else: #If it can't avamce
-                    self.blocked_pawns += 1
+            else: #If it can't avamce
+                self.blocked_pawns += 1
 
-                if i == paso and abs(self.move_log[-1].x1 - j)==1 and self.move_log[-1].piece[1] == "p" and self.move_log[-1].y0==7-pos_0 and self.move_log[-1].y1==paso:
-                    movements.append(Move(i, j, i+dirs, self.move_log[-1].x1, p+"p", paso=True)) #Check 'en passant'
+            if self.enpassant_square and i+dirs == self.enpassant_square[0] and abs(self.enpassant_square[1] - j)==1:
+                movements.append(Move(i, j, i+dirs, self.enpassant_square[1], p+"p", paso=True)) #Check 'en passant'
 
-                if 0 <= i+dirs <= 7 and 0 <= j+1 <= 7:
-                    if self.board[i+dirs][j+1][0] == c: #Capture right
-                        movements.append(Move(i, j, i+dirs, j+1, p+"p"))
-                if 0 <= i+dirs <= 7 and 0 <= j-1 <= 7:
-                    if self.board[i+dirs][j-1][0] == c: #Capture left
-                        movements.append(Move(i, j, i+dirs, j-1, p+"p"))
-
-            else:
-                if 0 <= i+dirs <= 7 and 0 <= j+1 <= 7:
-                    movements.append(Move(i, j, i+dirs, j+1, p+"p", self.board[i+dirs][j+1])) #Defend Right
-                if 0 <= i+dirs <= 7 and 0 <= j-1 <= 7:
-                    movements.append(Move(i, j, i+dirs, j-1, p+"p", self.board[i+dirs][j-1])) #Defend left
+            if 0 <= i+dirs <= 7 and 0 <= j+1 <= 7:
+                if self.board[i+dirs][j+1][0] == c: #Capture right
+                    movements.append(Move(i, j, i+dirs, j+1, p+"p", self.board[i+dirs][j+1]))
+            if 0 <= i+dirs <= 7 and 0 <= j-1 <= 7:
+                if self.board[i+dirs][j-1][0] == c: #Capture left
+                    movements.append(Move(i, j, i+dirs, j-1, p+"p", self.board[i+dirs][j-1]))
 
         return movements
 
     def promotion(self):
         """
         If there's a pawn in the last line, change it by a Queen
+        * Only the squares of the pawns are visited (see pawns_pos)
         """
-        for j in range(8):
-            if self.board[0][j] == "wp":
-                self.board[0][j] = "wQ"
-                return True
-            if self.board[7][j] == "bp":
-                self.board[7][j] = "bQ"
-                return True
+        for pawn, queen, y in (("wp", "wQ", 0), ("bp", "bQ", 7)):
+            for i, j in self.pawns_pos[pawn]:
+                if i == y:
+                    self.set_square(i, j, queen)
+                    return True
 
         return False
 
-    def r_b_Q_movements(self, a_piece, dirx, diry, flag, i, j, piece):
+    def r_b_Q_movements(self, a_piece, dirx, diry, i, j, piece):
         """
         It computes the rock's, bishop's and queen's movement and returns them (a list of 'Move')
         * a_piece: If the piece we want to compute the move is a R | B | Q
         * dirx: The directions it can move in the X axis.
         * diry: The directions it can move in the Y axis. The movement is compute with the corresponent direction of the dirx movement.
-        * Flag: It is used to determine wheter the pawns are used by the player or to check that the other is not doing check.
         """
         p = "w" if self.isWhiteTurn else "b"
         c = "b" if p == "w" else "w"
-        dirx = dirx
-        diry = diry
 
         movements = []
 
-        if flag:
-
-            if piece == p+a_piece:
-
-                for k in range(4):
-                    a = "__"
-                    b = 1
-
-                    if i+dirx[k]*b>=0 and j+diry[k]*b>=0 and i+dirx[k]*b<=7 and j+diry[k]*b<=7: #Make sure the movement is in the board boundaries
-                        a = self.board[i+dirx[k]*b][j+diry[k]*b]
-
-                    while a == "--" or a[0] == c:
-                        movements.append(Move(i, j, i+dirx[k]*b, j+diry[k]*b, piece, a))
+        if piece == p+a_piece:
 
-                        if a[0] == c:
-                            break
-
-                        b += 1
-                        a = "__"
-                        if i+dirx[k]*b>=0 and j+diry[k]*b>=0 and i+dirx[k]*b<=7 and j+diry[k]*b<=7:
-                            a = self.board[i+dirx[k]*b][j+diry[k]*b]
+            for k in range(4):
+                a = "__"
+                b = 1
 
-            return movements
+                if i+dirx[k]*b>=0 and j+diry[k]*b>=0 and i+dirx[k]*b<=7 and j+diry[k]*b<=7: #Make sure the movement is in the board boundaries
+                    a = self.board[i+dirx[k]*b][j+diry[k]*b]
 
-        else:
+                while a == "--" or a[0] == c:
+                    movements.append(Move(i, j, i+dirx[k]*b, j+diry[k]*b, piece, a))
 
-            if piece == p+a_piece:
+                    if a[0] == c:
+                        break
 
-                for k in range(4):
+                    b += 1
                     a = "__"
-                    b = 1
-
                     if i+dirx[k]*b>=0 and j+diry[k]*b>=0 and i+dirx[k]*b<=7 and j+diry[k]*b<=7:
                         a = self.board[i+dirx[k]*b][j+diry[k]*b]
 
-                    while a != "__":
-                        movements.append(Move(i, j, i+dirx[k]*b, j+diry[k]*b, piece, a))
-
-                        if a[0] != "-": #If there's a piece #Changed and to revise kdfg dkfgbkdhfg sfdhgsdkfhbg sdfhbkdfhb xkdhfbvkdfhbvx dfhbv xfhbv xfhdbvx fhvbxf dvdfxjhv x
-                            break
-
-                        b += 1
-                        a = "__"
-                        if i+dirx[k]*b>=0 and j+diry[k]*b>=0 and i+dirx[k]*b<=7 and j+diry[k]*b<=7:
-                            a = self.board[i+dirx[k]*b][j+diry[k]*b]
-
-            return movements
+        return movements
 
-    def knight_movement(self, flag, i, j, piece):
+    def knight_movement(self, i, j, piece):
         """
         It computes the knight's movement and returns them (a list of 'Move')
-        * Flag: It is used to determine wheter the pawns are used by the player or to check that the other is not doing check.
         """
         p = "w" if self.isWhiteTurn else "b"
         c = "b" if p == "w" else "w"
@@ -394,55 +926,36 @@ class GameState():
 
                 if i+b>=0 and j+k>=0 and i+b<=7 and j+k<=7:
                     a = self.board[i+b][j+k]
-
-                    if flag:
-                        if a == "--" or a[0] == c:
-                            movements.append(Move(i, j, i+b, j+k, p+"N"))
-                    else: #Changed and to revise ejrbf skjdhbfvskjxhdfb sjfd
-                            movements.append(Move(i, j, i+b, j+k, p+"N", a))
+                    if a == "--" or a[0] == c:
+                        movements.append(Move(i, j, i+b, j+k, p+"N", a))
 
                 if i-b>=0 and j+k>=0 and i-b<=7 and j+k<=7:
                     a = self.board[i-b][j+k]
-
-                    if flag:
-                        if a == "--" or a[0] == c:
-                            movements.append(Move(i, j, i-b, j+k, p+"N"))
-                    else:
-                            movements.append(Move(i, j, i-b, j+k, p+"N", a))
+                    if a == "--" or a[0] == c:
+                        movements.append(Move(i, j, i-b, j+k, p+"N", a))
 
                     
         return movements
 
-    def king_movement(self, flag):
+    def king_movement(self):
         """
         It computes the king's movement and returns them (a list of 'Move').
         It doesn’t do the castle logic neither checks check
-        * Flag: It is used to determine wheter the pawns are used by the player or to check that the other is not doing check.
         """
         p = "w" if self.isWhiteTurn else "b"
         c = "b" if p == "w" else "w"
-        dirx = (1, -1, 0)
 
         movements = []
 
-        for i in range(8):
-            for j, piece in enumerate(self.board[i]):
-                if piece == p+"K":
-
-                    for k in dirx:
-                        for z in dirx:
-                            if abs(z) + abs(k) > 0:
-                                a = "__"
-
-                                if 0 <= i+z <= 7 and 0 <= j+k <= 7:
-                                    a = self.board[i+z][j+k]
-
-                                    if flag:
-                                        if a == "--" or a[0] == c:
-                                            movements.append(Move(i, j, i+z, j+k, p+"K"))
+        king_pos = self.king_squares[p]
+        if king_pos is None:
+            return movements
 
-                                    else: #arbg sjdrhbgskjgrbskjrgfb skjbfrkzjhsbgfskjzfhbg sjdfbg sjf--<< Changed
-                                            movements.append(Move(i, j, i+z, j+k, p+"K"))
+        i, j = king_pos
+        for y, x in KING_TARGETS[i*8 + j]:
+            a = self.board[y][x]
+            if a == "--" or a[0] == c:
+                movements.append(Move(i, j, y, x, p+"K", a))
 
         return movements
 
@@ -453,75 +966,56 @@ class GameState():
         """
         value = 1 if not undoing else -1
 
-        if (move.piece == "bR" and move.x0 == 7) or move.piece == "bK":
+        # The rook has to move from its corner, or be captured there
+        corners = {(move.y0, move.x0, move.piece), (move.y1, move.x1, move.piece_capt)}
+
+        if (0, 7, "bR") in corners or move.piece == "bK":
             self.b_r_enroc += value
-        if( move.piece == "bR" and move.x0 == 0) or move.piece == "bK":
+        if (0, 0, "bR") in corners or move.piece == "bK":
             self.b_l_enroc += value
-        if (move.piece == "wR" and move.x0 == 0) or move.piece == "wK":
+        if (7, 0, "wR") in corners or move.piece == "wK":
             self.w_l_enroc += value
-        if (move.piece == "wR" and move.x0 == 7) or move.piece == "wK":
+        if (7, 7, "wR") in corners or move.piece == "wK":
             self.w_r_enroc += value
 
-    def enroc(self, other_moves):
+    def enroc(self):
         """
-        If possible, it appends the castle moves.
+        If possible, it returns the castle moves. The king can't be in check nor pass through an attacked square
         """
         p = "w" if self.isWhiteTurn else "b"
+        c = "b" if p == "w" else "w"
+        y = 7 if p == "w" else 0
         movements = []
-        
-        if p == "w":
-            self.check_check(other_moves, (7,4), "w")
-            if not self.theresCheck:
-                if self.w_l_enroc==0 and self.board[7][3]=="--" and self.board[7][2]=="--" and self.board[7][0]=="wR":
-                    self.check_check(other_moves, (7,3), "w")
-                    if not self.theresCheck:
-                        movements.append(Move(7, 4, 7, 2, "wK", enroc="l"))
-                if self.w_r_enroc==0 and self.board[7][5]=="--" and self.board[7][6]=="--" and self.board[7][7]=="wR":
-                    self.check_check(other_moves, (7,5), "w")
-                    if not self.theresCheck:
-                        movements.append(Move(7, 4, 7, 6, "wK", enroc="r"))
-
-        if p == "b":
-            self.check_check(other_moves, (0,4), "b")
-            if not self.theresCheck:
-                if self.b_l_enroc==0 and self.board[0][3]=="--" and self.board[0][2]=="--" and self.board[0][0]=="bR":
-                    self.check_check(other_moves, (0,3), "b")
-                    if not self.theresCheck:
-                        movements.append(Move(0, 4, 0, 2, "bK", enroc="l"))
-                if self.b_r_enroc==0 and self.board[0][5]=="--" and self.board[0][6]=="--" and self.board[0][7]=="bR":
-                    self.check_check(other_moves, (0,5), "b")
-                    if not self.theresCheck:
-                        movements.append(Move(0, 4, 0, 6, "bK", enroc="r"))
+
+        if self.is_square_attacked((y, 4), c):
+            return movements
+
+        left, right = (self.w_l_enroc, self.w_r_enroc) if p == "w" else (self.b_l_enroc, self.b_r_enroc)
+        if left==0 and self.board[y][3]=="--" and self.board[y][2]=="--" and self.board[y][1]=="--" and self.board[y][0]==p+"R":
+            if not self.is_square_attacked((y, 3), c):
+                movements.append(Move(y, 4, y, 2, p+"K", enroc="l"))
+        if right==0 and self.board[y][5]=="--" and self.board[y][6]=="--" and self.board[y][7]==p+"R":
+            if not self.is_square_attacked((y, 5), c):
+                movements.append(Move(y, 4, y, 6, p+"K", enroc="r"))
 
         return movements
 
 
-    def check_king_movement(self, other_moves):
+    def check_king_movement(self):
         """
-        It deletes a king movement if a piece can kill it.
+        It returns the king movements (and castles) to the squares that no piece attacks.
         """
-        king_movements = self.king_movement(True)
-        king_movements += self.enroc(other_moves)
-
-        p = "b" if not self.isWhiteTurn else "w"
-        c = "w" if not self.isWhiteTurn else "b"
-
-        to_del = []
-        for i, king_move in enumerate(king_movements):
-            for move in other_moves:
-                if king_move.y1 == move.y1:
-                    if king_move.x1 == move.x1:
-                        to_del.append(i)
-                        break
+        king_pos, p = self.calc_kings_position(False)
+        c = "b" if p == "w" else "w"
 
-        for i, j in enumerate(to_del):
-            del king_movements[-i+j]
+        king_movements = [move for move in self.king_movement() if not self.is_square_attacked((move.y1, move.x1), c, king_pos)]
+        king_movements += self.enroc()
 
         return king_movements
 
     def calc_kings_position(self, isTurnInverted):
         """
-        It finds the king position and return:
+        It finds the king position (kept by set_square) and return:
         * A tuple with the position (y, x)
         * The current player
         """
@@ -531,23 +1025,14 @@ class GameState():
         else:
             p = "w" if self.isWhiteTurn else "b"
 
-        for y in range(len(self.board)):
-            for x in range(len(self.board)):
-                if self.board[y][x][0] == p and self.board[y][x][1] == "K":
-                    return (y, x), p
+        return self.king_squares[p], p
 
-    def check_check(self, other_moves, king_pos, p):
+    def check_check(self, king_pos, p):
         """
-        It checks if the king is under check.
-        It sets the self.theresCheck bool to True.
+        It checks if the king of 'p' in 'king_pos' is under check.
+        It sets the self.theresCheck bool.
         """
-        if king_pos:
-            for move in other_moves:
-                if king_pos[0] == move.y1:
-                    if king_pos[1] == move.x1:
-                        if move.piece != p+"K":
-                            self.theresCheck = True
-                            break
+        self.theresCheck = king_pos is not None and self.is_square_attacked(king_pos, "b" if p == "w" else "w")
 
     def check_checkMate(self):
         """
@@ -560,34 +1045,57 @@ class GameState():
     def check_draw(self):
         """
         It checks if the position is a draw.
-        If yes, it sets the boolean var self.theresDraw to True.
-        """
-        if len(self.legal_moves) == 0 and not self.theresCheck:
-            self.theresDraw = True
-
-        if len(self.move_log) > 9:
-            if self.move_log[-1].x0 == self.move_log[-5].x0 == self.move_log[-9].x0:
-                if self.move_log[-1].y0 == self.move_log[-5].y0 == self.move_log[-9].y0:
-                    if self.move_log[-1].piece == self.move_log[-5].piece == self.move_log[-9].piece:
-                        self.theresDraw = True
-
-        if len(self.legal_moves) < 10:
-            w = 0
-            b = 0
-            for i in range(8):
-                for j in range(8):
-                    if self.board[i][j][0] == "w":
-                        w += 1
-                    elif self.board[i][j][0] == "b":
-                        b += 1
-
-                    if w + b > 2:
-                        break
-                    
-                if w + b > 2:
-                    break
-
-            if w + b <= 2:
-                self.theresDraw = True
-
-
+        It sets the boolean var self.theresDraw.
+        * Stalemate, threefold repetition (see repetitions), fifty-move rule (100 plies without captures nor pawn moves)
+        and insufficient material
+        """
+        stalemate = len(self.legal_moves) == 0 and not self.theresCheck
+        fifty_moves = self.halfmove_clock >= 100 and not self.theresCheckMate
+        self.theresDraw = stalemate or fifty_moves or self.insufficient_material or self.repetitions() >= 2
+
+
+
+
+def parse_epd(line):
+    """
+    It reads a line of an EPD file: https://www.chessprogramming.org/Extended_Position_Description
+    It returns the FEN of the position and a dict with the operations (opcode: operands), as {"bm": "Nf3", "id": "WAC.001"}
+    * The move counters of the FEN are the operations hmvc and fmvn, if they are given
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("EPD with less than 4 fields: " + line)
+
+    operations = {}
+    rest = fields[4] if len(fields) > 4 else ""
+    while rest.strip():
+        # Every operation ends with ';', except in a string ("...")
+        operation, quoted, end = "", False, 0
+        for end, char in enumerate(rest):
+            if char == '"':
+                quoted = not quoted
+            elif char == ";" and not quoted:
+                break
+            operation += char
+        else:
+            end = len(rest)
+        rest = rest[end + 1:]
+
+        parts = operation.strip().split(None, 1)
+        if parts:
+            operations[parts[0]] = parts[1].strip().strip('"') if len(parts) > 1 else ""
+
+    fen = " ".join(fields[:4] + [operations.get("hmvc", "0"), operations.get("fmvn", "1")])
+    return fen, operations
+
+
+def read_epd(path):
+    """
+    It returns a list with (FEN, operations) of every position of the EPD file (see parse_epd)
+    """
+    positions = []
+    with open(path) as file:
+        for line in file:
+            if line.strip() and not line.startswith("#"):
+                positions.append(parse_epd(line.strip()))
+    return positions
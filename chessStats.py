@@ -0,0 +1,176 @@
+"""
+Statistics of the searches of ChessEngine, to tune the engine and to find regressions.
+* They're collected only if a SearchStats is given to the engine (ChessEngine.stats), without it the search doesn't count
+anything more than its own counters
+* Every depth of the iterative deepening and every search can be written as a line of JSON (see SearchStats.output)
+"""
+import json
+from time import perf_counter, time
+
+from chessPerft import move_name
+
+
+def engine_counters(engine, since=None):
+    """
+    The counters of the search of 'engine' (they only grow during a search), or what they've grown from the counters 'since'.
+    The worker processes send them with their results, so the parallel searches get the stats of all the processes
+    """
+    counters = {"nodes": engine.nodes,
+                "q_nodes": engine.q_stats["nodes"],
+                "leaves": engine.q_stats["leaves"],
+                "cutoffs": engine.ordering.cutoffs,
+                "first_move_cutoffs": engine.ordering.first_move_cutoffs,
+                "tt_probes": engine.tt.probes,
+                "tt_hits": engine.tt.hits,
+                "tt_cutoffs": engine.tt.cutoffs,
+                "tablebase_hits": engine.tablebases.hits if engine.tablebases is not None else 0,
+                "aspiration_researches": engine.aspiration_researches,
+                "pvs_researches": engine.pvs_researches,
+                "null_move_cutoffs": engine.pruning_stats["null_move_cutoffs"],
+                "lmr_reductions": engine.pruning_stats["lmr_reductions"],
+                "futility_pruned": engine.pruning_stats["futility_pruned"]}
+    if since is not None:
+        for name in counters:
+            counters[name] -= since[name]
+    return counters
+
+
+class SearchStats():
+    def __init__(self, output=None):
+        """
+        Statistics of ChessEngine.search, by depth and for the whole search, and of the parallel searches of
+        ChessEngine.minimax_root (only for the whole search)
+        * output: Optional file (opened for writing) where every depth and the summary of every search are written as a line
+        of JSON, with "type" "depth" or "search"
+        * The move generation (calc_legal_moves of the GameState) and the evaluation (GameEval.eval_pos) are counted and timed
+        by wrapping them during the search (see self.instrument)
+        * The counters of the engine (nodes, cutoffs, transposition table...) are read at the end of every depth, so the
+        search isn't slowed down by them
+        """
+        self.output = output
+        self.searches = 0
+
+        self.depths = []
+        self.summary = {}
+
+        self.calls = {"move_generation": 0, "evaluation": 0}
+        self.seconds = {"move_generation": 0.0, "evaluation": 0.0}
+        self.start_time = 0
+        self.start_counters = {}
+        self.last_counters = {}
+
+    def timed(self, name:str, function):
+        """
+        It returns 'function' counting its calls and the time spent in it as 'name'
+        """
+        calls, seconds = self.calls, self.seconds
+
+        def wrapper(*args, **kwargs):
+            t = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[name] += perf_counter() - t
+                calls[name] += 1
+        return wrapper
+
+    def instrument(self, game):
+        """
+        It times the move generation of 'game' (the copy searched in a depth). It's an attribute of the object, so the other
+        games aren't changed
+        """
+        game.calc_legal_moves = self.timed("move_generation", game.calc_legal_moves)
+
+    def counters(self, engine):
+        """
+        The counters of the engine and of the wrapped functions at this moment (they only grow during a search)
+        """
+        counters = engine_counters(engine)
+        counters["evaluations"] = self.calls["evaluation"]
+        counters["move_generations"] = self.calls["move_generation"]
+        counters["move_generation_seconds"] = self.seconds["move_generation"]
+        counters["evaluation_seconds"] = self.seconds["evaluation"]
+        return counters
+
+    def start(self, engine):
+        """
+        It has to be called at the start of the search (after resetting the counters of the engine): the evaluation is wrapped
+        until self.finish
+        """
+        self.searches += 1
+        self.depths = []
+        self.summary = {}
+        for name in self.calls:
+            self.calls[name] = 0
+            self.seconds[name] = 0.0
+        if "eval_pos" in vars(engine.gameEval): # Left by a search that didn't finish
+            del engine.gameEval.eval_pos
+        engine.gameEval.eval_pos = self.timed("evaluation", engine.gameEval.eval_pos)
+        self.start_time = time()
+        self.start_counters = self.counters(engine)
+        self.last_counters = self.start_counters
+
+    def record(self, counters:dict, previous:dict, seconds:float):
+        """
+        The stats between two readings of the counters: the differences, the rates and the nodes per second
+        """
+        stats = {name: value - previous[name] for name, value in counters.items()}
+        for name in ("move_generation_seconds", "evaluation_seconds"):
+            stats[name] = round(stats[name], 6)
+        stats["seconds"] = round(seconds, 6)
+        stats["nps"] = int(stats["nodes"] / seconds) if seconds else 0
+        stats["first_move_cutoff_rate"] = stats["first_move_cutoffs"] / stats["cutoffs"] if stats["cutoffs"] else 0.0
+        stats["tt_hit_rate"] = stats["tt_hits"] / stats["tt_probes"] if stats["tt_probes"] else 0.0
+        return stats
+
+    def depth_done(self, engine, depth:int, evaluation:float, move, seconds:float):
+        """
+        It records a depth of the iterative deepening (seconds since the start of the search).
+        The effective branching factor is the ratio of the nodes of this depth and of the previous one
+        """
+        counters = self.counters(engine)
+        previous_seconds = self.depths[-1]["elapsed"] if self.depths else 0
+        stats = self.record(counters, self.last_counters, seconds - previous_seconds)
+        stats["depth"] = depth
+        stats["evaluation"] = evaluation
+        stats["move"] = move_name(move) if move is not None else None
+        stats["elapsed"] = round(seconds, 6)
+        stats["branching_factor"] = stats["nodes"] / self.depths[-1]["nodes"] if self.depths and self.depths[-1]["nodes"] else 0.0
+        self.depths.append(stats)
+        self.last_counters = counters
+        self.write("depth", stats)
+
+    def finish(self, engine, move, evaluation:float, depth:int, workers=(), details=None):
+        """
+        It removes the wrapper of the evaluation and returns the summary of the search (with the list of its depths)
+        * workers: In the parallel searches, the counters of every worker process in the search (see engine_counters). They're
+        added to the ones of this process. The evaluations and the move generation are only counted and timed in this process
+        * details: Other values of the search for the summary, as the splits of the Young Brothers Wait search
+        """
+        if "eval_pos" in vars(engine.gameEval):
+            del engine.gameEval.eval_pos
+        seconds = time() - self.start_time
+        counters = self.counters(engine)
+        for worker_counters in workers:
+            for name, value in worker_counters.items():
+                counters[name] += value
+        self.summary = self.record(counters, self.start_counters, seconds)
+        self.summary.update(details or {})
+        self.summary["search"] = self.searches
+        self.summary["depth"] = depth
+        self.summary["evaluation"] = evaluation
+        self.summary["move"] = move_name(move) if move is not None else None
+        # Geometric mean of the branching factors of the depths after the first one
+        factors = [stats["branching_factor"] for stats in self.depths[1:] if stats["branching_factor"]]
+        product = 1.0
+        for factor in factors:
+            product *= factor
+        self.summary["branching_factor"] = product ** (1 / len(factors)) if factors else 0.0
+        self.write("search", self.summary)
+        self.summary["depths"] = self.depths
+        return self.summary
+
+    def write(self, kind:str, stats:dict):
+        if self.output is not None:
+            self.output.write(json.dumps(dict(stats, type=kind)) + "\n")
+            self.output.flush()
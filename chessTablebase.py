@@ -0,0 +1,460 @@
+"""
+Endgame tablebases of the endings of a king and one or two pieces against a lonely king: KQK, KRK, KPK and KBNK.
+* They're generated here with retrograde analysis (see TablebaseGenerator), from the mates backwards, and saved to files
+* Every position is a byte: 0 is a draw, 1-127 the player to move wins in that number of plies and 128 + n the player
+to move is mated in n plies (distance to mate, without the fifty-move rule)
+* The tables are saved with the strong side as white. The positions with black as the strong side are probed with
+the colours swapped (see Tablebases.probe)
+* By symmetry only the positions with the white king in a part of the board are kept: a1-d1-d4 without pawns (the 8
+rotations and mirrors of the board), the files a-d with pawns (only the left-right mirror)
+* Generation: python chessTablebase.py generate --dir tablebases (KBNK takes some minutes)
+"""
+import argparse
+import mmap
+import os
+from itertools import product
+from time import time
+
+from chessRules import GameState, Move, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKERS, RAYS
+
+# Pieces of the strong side after its king, by table. The tables needed by another one go first (KPK promotes to KQK)
+TABLES = {"KQK": ("wQ",), "KRK": ("wR",), "KPK": ("wp",), "KBNK": ("wB", "wN")}
+
+# Values of the tables
+DRAW = 0
+LOSS = 128
+
+# The tables as lists of squares (y*8 + x) instead of (y, x)
+KNIGHT_SQUARES = [frozenset(y*8 + x for y, x in targets) for targets in KNIGHT_TARGETS]
+KING_SQUARES = [frozenset(y*8 + x for y, x in targets) for targets in KING_TARGETS]
+WHITE_PAWN_ATTACKERS = [frozenset(y*8 + x for y, x in attackers) for attackers in PAWN_ATTACKERS["w"]]
+ROOK_RAYS = [[[y*8 + x for y, x in ray] for (dy, dx), ray in rays if dy == 0 or dx == 0] for rays in RAYS]
+BISHOP_RAYS = [[[y*8 + x for y, x in ray] for (dy, dx), ray in rays if dy != 0 and dx != 0] for rays in RAYS]
+
+# Symmetries of the board, as the square where every square goes: the 4 first ones keep the files and ranks
+SYMMETRIES = [[f(sq >> 3, sq & 7) for sq in range(64)] for f in (lambda y, x: y*8 + x, lambda y, x: y*8 + 7-x,
+                                                                 lambda y, x: (7-y)*8 + x, lambda y, x: (7-y)*8 + 7-x,
+                                                                 lambda y, x: x*8 + y, lambda y, x: x*8 + 7-y,
+                                                                 lambda y, x: (7-x)*8 + y, lambda y, x: (7-x)*8 + 7-y)]
+# Squares of the white king kept in the tables: a1-d1-d4 (file x, rank 7-y <= x) without pawns and files a-d with them
+KING_SQUARES_PAWNLESS = [sq for sq in range(64) if (sq & 7) <= 3 and 7 - (sq >> 3) <= (sq & 7)]
+KING_SQUARES_PAWNS = [sq for sq in range(64) if (sq & 7) <= 3]
+
+
+def slider_attacks(rays, target, occupied):
+    """
+    It checks if a slider with those rays attacks the square 'target' (the occupied squares block the rays)
+    """
+    for ray in rays:
+        for sq in ray:
+            if sq == target:
+                return True
+            if (occupied >> sq) & 1:
+                break
+    return False
+
+
+class TablebaseGenerator():
+    def __init__(self, name:str, tables=None):
+        """
+        Retrograde analysis of a table: https://www.chessprogramming.org/Retrograde_Analysis
+        * The positions are tuples of squares: white king, the pieces of TABLES[name] and black king, and the player
+        to move (0 white, 1 black)
+        * tables: The values of the tables needed by this one (KQK for KPK), by name
+        """
+        self.name = name
+        self.pieces = ("wK",) + TABLES[name] + ("bK",)
+        self.pawns = "wp" in self.pieces
+        self.tables = tables or {}
+
+        self.symmetries = SYMMETRIES[:2] if self.pawns else SYMMETRIES
+        self.king_squares = KING_SQUARES_PAWNS if self.pawns else KING_SQUARES_PAWNLESS
+        self.king_index = {sq: i for i, sq in enumerate(self.king_squares)}
+        # The symmetries that take every square of the white king to the squares kept
+        self.king_symmetries = [[s for s in self.symmetries if s[sq] in self.king_index] for sq in range(64)]
+
+        self.rest = 64 ** (len(self.pieces) - 1)
+        self.half = len(self.king_squares) * self.rest
+        self.size = 2 * self.half
+        # The pawn promotes to a queen
+        self.promotions = TablebaseGenerator("KQK") if self.pawns else None
+
+    def index(self, squares, turn:int):
+        """
+        It returns the index of the position in the table, with the symmetry that gives the smallest squares.
+        So all the symmetric positions get the same index
+        """
+        symmetries = self.king_symmetries[squares[0]]
+        if len(symmetries) == 1:
+            best = [symmetries[0][sq] for sq in squares]
+        else:
+            best = min([s[sq] for sq in squares] for s in symmetries)
+        index = turn * self.half + self.king_index[best[0]] * self.rest
+        factor = self.rest
+        for sq in best[1:]:
+            factor //= 64
+            index += sq * factor
+        return index
+
+    def position(self, index:int):
+        """
+        It returns the squares and the player to move of an index of the table
+        """
+        turn, index = divmod(index, self.half)
+        king, index = divmod(index, self.rest)
+        squares = [self.king_squares[king]]
+        factor = self.rest
+        for _ in self.pieces[1:]:
+            factor //= 64
+            sq, index = divmod(index, factor)
+            squares.append(sq)
+        return tuple(squares), turn
+
+    def white_attacks(self, squares, target:int, occupied:int, skip=-1):
+        """
+        It checks if a piece of white attacks the square 'target'. The piece number 'skip' doesn't count (it's captured)
+        """
+        for i, piece in enumerate(self.pieces[:-1]):
+            sq = squares[i]
+            if i == skip:
+                continue
+            kind = piece[1]
+            if kind == "K":
+                if target in KING_SQUARES[sq]:
+                    return True
+            elif kind == "N":
+                if target in KNIGHT_SQUARES[sq]:
+                    return True
+            elif kind == "p":
+                if sq in WHITE_PAWN_ATTACKERS[target]:
+                    return True
+            else:
+                if kind != "B" and slider_attacks(ROOK_RAYS[sq], target, occupied):
+                    return True
+                if kind != "R" and slider_attacks(BISHOP_RAYS[sq], target, occupied):
+                    return True
+        return False
+
+    def is_valid(self, squares, turn:int):
+        """
+        It checks if the position can happen: different squares, no pawns in the first nor the last rank, the kings
+        not touching each other and, if white moves, the black king not in check
+        """
+        if len(set(squares)) != len(squares):
+            return False
+        if squares[-1] in KING_SQUARES[squares[0]]:
+            return False
+        for i, piece in enumerate(self.pieces):
+            if piece == "wp" and squares[i] >> 3 in (0, 7):
+                return False
+        if turn == 0:
+            occupied = 0
+            for sq in squares:
+                occupied |= 1 << sq
+            return not self.white_attacks(squares, squares[-1], occupied)
+        return True
+
+    def white_moves(self, squares):
+        """
+        It yields the moves of white as (squares after the move, promotion). The position has to be valid
+        """
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        black_king = squares[-1]
+        for i, piece in enumerate(self.pieces[:-1]):
+            sq = squares[i]
+            kind = piece[1]
+            if kind == "K":
+                targets = [to for to in KING_SQUARES[sq] if not (occupied >> to) & 1 and to not in KING_SQUARES[black_king]]
+            elif kind == "N":
+                targets = [to for to in KNIGHT_SQUARES[sq] if not (occupied >> to) & 1]
+            elif kind == "p":
+                targets = []
+                if not (occupied >> (sq - 8)) & 1:
+                    targets.append(sq - 8)
+                    if sq >> 3 == 6 and not (occupied >> (sq - 16)) & 1:
+                        targets.append(sq - 16)
+            else:
+                rays = (ROOK_RAYS[sq] if kind != "B" else []) + (BISHOP_RAYS[sq] if kind != "R" else [])
+                targets = []
+                for ray in rays:
+                    for to in ray:
+                        if (occupied >> to) & 1:
+                            break
+                        targets.append(to)
+            for to in targets:
+                yield squares[:i] + (to,) + squares[i+1:], kind == "p" and to >> 3 == 0
+
+    def black_moves(self, squares):
+        """
+        It yields the moves of the black king as (squares after the move, captured piece number or -1)
+        """
+        king = squares[-1]
+        occupied = 0
+        for sq in squares[:-1]:
+            occupied |= 1 << sq
+        for to in KING_SQUARES[king]:
+            captured = squares.index(to) if to in squares[:-1] else -1
+            if captured == 0:
+                continue
+            after = occupied & ~(1 << to) if captured >= 0 else occupied
+            if not self.white_attacks(squares, to, after, captured):
+                yield squares[:-1] + (to,), captured
+
+    def white_unmoves(self, squares):
+        """
+        It yields the positions (white to move) where a move of white gives this one (black to move), without promotions
+        """
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        for i, piece in enumerate(self.pieces[:-1]):
+            sq = squares[i]
+            kind = piece[1]
+            if kind == "K":
+                origins = [fr for fr in KING_SQUARES[sq] if not (occupied >> fr) & 1]
+            elif kind == "N":
+                origins = [fr for fr in KNIGHT_SQUARES[sq] if not (occupied >> fr) & 1]
+            elif kind == "p":
+                origins = []
+                if sq >> 3 <= 5 and not (occupied >> (sq + 8)) & 1:
+                    origins.append(sq + 8)
+                    if sq >> 3 == 4 and not (occupied >> (sq + 16)) & 1:
+                        origins.append(sq + 16)
+            else:
+                rays = (ROOK_RAYS[sq] if kind != "B" else []) + (BISHOP_RAYS[sq] if kind != "R" else [])
+                origins = []
+                for ray in rays:
+                    for fr in ray:
+                        if (occupied >> fr) & 1:
+                            break
+                        origins.append(fr)
+            for fr in origins:
+                before = squares[:i] + (fr,) + squares[i+1:]
+                if self.is_valid(before, 0):
+                    yield before
+
+    def black_unmoves(self, squares):
+        """
+        It yields the positions (black to move) where a move of the black king, without capturing, gives this one (white to move)
+        """
+        king = squares[-1]
+        for fr in KING_SQUARES[king]:
+            if fr not in squares:
+                before = squares[:-1] + (fr,)
+                if self.is_valid(before, 1):
+                    yield before
+
+    def generate(self, verbose=True):
+        """
+        It returns the table as a bytearray (see the values at the top of the module)
+        * The positions of black are counted how many moves (to different positions) they have left. When a move goes to
+        a position won by white the count goes down, and at 0 all the moves lose
+        * The captures of black always draw (only a king, or a king and a minor piece, are left)
+        """
+        t0 = time()
+        values = bytearray(self.size)
+        counts = bytearray(self.size) # Moves left of black, 255 if black can draw
+        losses = [] # Positions of black lost in the current number of plies
+        promotions = {} # Plies -> positions won by white promoting (see KQK)
+
+        for index in range(self.size):
+            squares, turn = self.position(index)
+            if not self.is_valid(squares, turn) or self.index(squares, turn) != index:
+                continue
+            if turn == 1:
+                children = set()
+                draw = False
+                for after, captured in self.black_moves(squares):
+                    if captured >= 0:
+                        draw = True
+                        break
+                    children.add(self.index(after, 0))
+                if draw:
+                    counts[index] = 255
+                elif children:
+                    counts[index] = len(children)
+                else:
+                    occupied = 0
+                    for sq in squares:
+                        occupied |= 1 << sq
+                    if self.white_attacks(squares, squares[-1], occupied):
+                        values[index] = LOSS # Checkmate
+                        losses.append(index)
+                    else:
+                        counts[index] = 255 # Stalemate
+            elif self.pawns:
+                best = None
+                for after, promotion in self.white_moves(squares):
+                    if promotion:
+                        value = self.promotion_value(after)
+                        if value >= LOSS and (best is None or value - LOSS + 1 < best):
+                            best = value - LOSS + 1
+                if best is not None:
+                    promotions.setdefault(best, []).append(index)
+
+        if verbose:
+            print("{}: {} mates, {:.1f} s".format(self.name, len(losses), time() - t0))
+
+        plies = 0
+        while losses or any(p > plies for p in promotions):
+            wins = []
+            for index in losses:
+                for before in self.white_unmoves(self.position(index)[0]):
+                    i = self.index(before, 0)
+                    if values[i] == DRAW:
+                        values[i] = plies + 1
+                        wins.append(i)
+            for i in promotions.pop(plies + 1, []):
+                if values[i] == DRAW:
+                    values[i] = plies + 1
+                    wins.append(i)
+
+            losses = []
+            for index in wins:
+                for i in {self.index(before, 1) for before in self.black_unmoves(self.position(index)[0])}:
+                    if values[i] == DRAW and counts[i] != 255:
+                        counts[i] -= 1
+                        if counts[i] == 0:
+                            values[i] = LOSS + plies + 2
+                            losses.append(i)
+            plies += 2
+            if verbose and (wins or losses):
+                print("{}: ply {} won {} lost {}, {:.1f} s".format(self.name, plies, len(wins), len(losses), time() - t0))
+
+        return values
+
+    def promotion_value(self, squares):
+        """
+        The value of the position of KQK (black to move) after the promotion of the pawn
+        """
+        return self.tables["KQK"][self.promotions.index(squares, 1)]
+
+
+def generate_tables(directory:str, names=tuple(TABLES), verbose=True):
+    """
+    It generates the tables (and the ones they need) and saves them as directory/<name>.tb
+    """
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+    for name in TABLES:
+        if name not in names and not (name == "KQK" and "KPK" in names):
+            continue
+        path = os.path.join(directory, name + ".tb")
+        if os.path.exists(path) and name not in names:
+            with open(path, "rb") as file:
+                tables[name] = file.read()
+            continue
+        tables[name] = TablebaseGenerator(name, tables).generate(verbose)
+        with open(path, "wb") as file:
+            file.write(tables[name])
+
+
+class Tablebases():
+    def __init__(self, directory:str):
+        """
+        The tables of the directory (see generate_tables), opened with mmap. It has to be closed with close()
+        """
+        self.directory = directory
+        self.generators = {}
+        self.files = {}
+        self.tables = {}
+        for name in TABLES:
+            path = os.path.join(directory, name + ".tb")
+            if not os.path.exists(path):
+                continue
+            generator = TablebaseGenerator(name)
+            file = open(path, "rb")
+            if os.path.getsize(path) != generator.size:
+                file.close()
+                raise ValueError("Wrong size of the table " + path)
+            self.generators[name] = generator
+            self.files[name] = file
+            self.tables[name] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Tables by the pieces of the strong side, sorted
+        self.materials = {tuple(sorted(TABLES[name])): name for name in self.tables}
+        self.max_pieces = max((len(TABLES[name]) + 2 for name in self.tables), default=0)
+
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        for file in self.files.values():
+            file.close()
+        self.tables = {}
+        self.materials = {}
+        self.max_pieces = 0
+
+    def probe(self, game:GameState):
+        """
+        It returns the result of the position for the player to move as (1 win | 0 draw | -1 loss, plies to the mate),
+        or None if there isn't a table of its pieces
+        * The castling and the fifty-move rule aren't taken into account
+        """
+        pieces = {"w": [], "b": []}
+        for p in "wb":
+            if len(game.piece_squares[p]) > self.max_pieces - 1:
+                return None
+            for y, x in game.piece_squares[p]:
+                piece = game.board[y][x]
+                if piece[1] != "K":
+                    pieces[p].append((piece[1], y*8 + x))
+        if pieces["w"] and pieces["b"]:
+            return None
+
+        # The strong side plays as white in the tables: with black, the board is turned upside down
+        strong = "w" if pieces["w"] else "b"
+        name = self.materials.get(tuple(sorted("w" + kind for kind, _ in pieces[strong])))
+        if name is None:
+            return None
+        self.probes += 1
+
+        flip = (lambda sq: sq) if strong == "w" else (lambda sq: (7 - (sq >> 3))*8 + (sq & 7))
+        weak = "b" if strong == "w" else "w"
+        kings = game.king_squares
+        squares = [flip(kings[strong][0]*8 + kings[strong][1])]
+        remaining = list(pieces[strong])
+        for piece in TABLES[name]:
+            for item in remaining:
+                if item[0] == piece[1]:
+                    squares.append(flip(item[1]))
+                    remaining.remove(item)
+                    break
+        squares.append(flip(kings[weak][0]*8 + kings[weak][1]))
+        turn = 0 if game.isWhiteTurn == (strong == "w") else 1
+
+        value = self.tables[name][self.generators[name].index(tuple(squares), turn)]
+        self.hits += 1
+        if value == DRAW:
+            return 0, 0
+        if value < LOSS:
+            return 1, value
+        return -1, value - LOSS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Endgame tablebases of the engine")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate the tables")
+    generate.add_argument("--dir", default="tablebases", help="Directory of the tables")
+    generate.add_argument("--tables", nargs="+", default=list(TABLES), choices=list(TABLES), help="Tables to generate")
+
+    probe = subparsers.add_parser("probe", help="Print the result of a position")
+    probe.add_argument("fen", help="Position")
+    probe.add_argument("--dir", default="tablebases", help="Directory of the tables")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_tables(args.dir, args.tables)
+    else:
+        tablebases = Tablebases(args.dir)
+        result = tablebases.probe(GameState.from_fen(args.fen))
+        if result is None:
+            print("Not in the tables")
+        else:
+            print({1: "Win", 0: "Draw", -1: "Loss"}[result[0]] + (" in {} plies".format(result[1]) if result[0] else ""))
+        tablebases.close()
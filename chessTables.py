@@ -0,0 +1,75 @@
+"""
+Values of the pieces and piece-square tables of the evaluation (Tomasz Michniewski's Simplified Evaluation Function).
+They are shared by GameEval and GameState, which keeps the running scores of the position (see GameState.set_square).
+"""
+
+PIECE_VALUES = {"p":100, "R":500, "N":320, "B":330, "Q":900, "K":20000}
+
+PAWNS_W_OPENING = [0,  0,  0,  0,  0,  0,  0,  0,
+                   50, 50, 50, 50, 50, 50, 50, 50,
+                   10, 10, 20, 30, 30, 20, 10, 10,
+                   5,  5, 10, 25, 25, 10,  5,  5,
+                   0,  0,  0, 20, 20,  0,  0,  0,
+                   5, -5,-10,  0,  0,-10, -5,  5,
+                   5, 10, 10,-20,-20, 10, 10,  5,
+                   0,  0,  0,  0,  0,  0,  0,  0]
+
+KNIGHTS_W_OPENING = [-50,-40,-30,-30,-30,-30,-40,-50,
+                     -40,-20,  0,  0,  0,  0,-20,-40,
+                     -30,  0, 10, 15, 15, 10,  0,-30,
+                     -30,  5, 15, 20, 20, 15,  5,-30,
+                     -30,  0, 15, 20, 20, 15,  0,-30,
+                     -30,  5, 10, 15, 15, 10,  5,-30,
+                     -40,-20,  0,  5,  5,  0,-20,-40,
+                     -50,-40,-30,-30,-30,-30,-40,-50]
+
+BISHOPS_W_OPENING = [-20,-10,-10,-10,-10,-10,-10,-20,
+                     -10,  0,  0,  0,  0,  0,  0,-10,
+                     -10,  0,  5, 10, 10,  5,  0,-10,
+                     -10,  5,  5, 10, 10,  5,  5,-10,
+                     -10,  0, 10, 10, 10, 10,  0,-10,
+                     -10, 10, 10, 10, 10, 10, 10,-10,
+                     -10,  5,  0,  0,  0,  0,  5,-10,
+                     -20,-10,-10,-10,-10,-10,-10,-20]
+
+ROCKS_W_OPENING = [0,  0,  0,  0,  0,  0,  0,  0,
+                   5, 10, 10, 10, 10, 10, 10,  5,
+                   -5,  0,  0,  0,  0,  0,  0, -5,
+                   -5,  0,  0,  0,  0,  0,  0, -5,
+                   -5,  0,  0,  0,  0,  0,  0, -5,
+                   -5,  0,  0,  0,  0,  0,  0, -5,
+                   -5,  0,  0,  0,  0,  0,  0, -5,
+                   0,  0,  0,  5,  5,  0,  0,  0]
+
+QUEEN_W_OPENING = [-20,-10,-10, -5, -5,-10,-10,-20,
+                   -10,  0,  0,  0,  0,  0,  0,-10,
+                   -10,  0,  5,  5,  5,  5,  0,-10,
+                   -5,  0,  5,  5,  5,  5,  0, -5,
+                   0,  0,  5,  5,  5,  5,  0, -5,
+                   -10,  5,  5,  5,  5,  5,  0,-10,
+                   -10,  0,  5,  0,  0,  0,  0,-10,
+                   -20,-10,-10, -5, -5,-10,-10,-20]
+
+KING_W_OPENING = [-30,-40,-40,-50,-50,-40,-40,-30,
+                  -30,-40,-40,-50,-50,-40,-40,-30,
+                  -30,-40,-40,-50,-50,-40,-40,-30,
+                  -30,-40,-40,-50,-50,-40,-40,-30,
+                  -20,-30,-30,-40,-40,-30,-30,-20,
+                  -10,-20,-20,-20,-20,-20,-20,-10,
+                  20, 20,  0,  0,  0,  0, 20, 20,
+                  20, 30, 10,  0,  0, 10, 30, 20]
+
+PIECES_OPENING_TABLES_W = {"p":PAWNS_W_OPENING, "R":ROCKS_W_OPENING,
+                           "N":KNIGHTS_W_OPENING, "B":BISHOPS_W_OPENING,
+                           "Q":QUEEN_W_OPENING, "K":KING_W_OPENING}
+
+# The same values for every piece with colour, with the sign of the player (white positive, black negative).
+# The tables of black are the white ones upside down
+MATERIAL_SCORES = {}
+POSITION_SCORES = {}
+for piece, value in PIECE_VALUES.items():
+    table = PIECES_OPENING_TABLES_W[piece]
+    MATERIAL_SCORES["w" + piece] = value
+    MATERIAL_SCORES["b" + piece] = -value
+    POSITION_SCORES["w" + piece] = list(table)
+    POSITION_SCORES["b" + piece] = [-table[(7 - sq//8)*8 + sq%8] for sq in range(64)]
@@ -0,0 +1,230 @@
+from array import array
+from multiprocessing import shared_memory
+
+# Types of score stored in the table
+EXACT = 0
+LOWER = 1 # The score is a lower bound (the search failed high)
+UPPER = 2 # The score is an upper bound (the search failed low)
+
+# Bytes used by an entry: key (8), score (4), depth (1), bound (1), age (1), move (2)
+ENTRY_BYTES = 17
+# Bytes used by an entry of the shared table: key xor data (8), data (8)
+SHARED_ENTRY_BYTES = 16
+
+
+def encode_move(move):
+    """
+    It returns the move as a 12 bits integer: (from square << 6) | to square. The squares are y*8 + x.
+    It's the hash of the Move (the packed move without the flags, see Move.pack)
+    """
+    return hash(move)
+
+
+class TranspositionTable():
+    def __init__(self, size_mb=16):
+        """
+        Fixed size table of searched positions, indexed by the Zobrist key of the GameState.
+        * Every bucket has two entries: the first one keeps the deepest search (depth-preferred), the second one is always replaced
+        * The entries of older searches (see new_search) can always be replaced
+        """
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 2**20) // (2 * ENTRY_BYTES))
+        self.age = 0
+
+        self.clear()
+
+    def __getstate__(self):
+        """
+        A table sent to another process (the pool workers) starts empty there. Sending it would cost more than filling it again
+        """
+        return {"size_mb": self.size_mb, "age": self.age}
+
+    def __setstate__(self, state):
+        self.__init__(state["size_mb"])
+        self.age = state["age"]
+
+    def clear(self):
+        """
+        It empties the table and resets the statistics
+        """
+        entries = 2 * self.buckets
+        self.keys = array("Q", bytes(8 * entries))
+        self.scores = array("i", bytes(4 * entries))
+        self.depths = array("b", bytes(entries))
+        self.bounds = array("B", bytes(entries))
+        self.ages = array("B", bytes(entries))
+        self.moves = array("H", bytes(2 * entries))
+
+        self.used = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def new_search(self):
+        """
+        It has to be called before every search, so the entries of the previous ones can be replaced first
+        """
+        self.age = (self.age + 1) % 256
+
+    def probe(self, key):
+        """
+        It returns the entry of the position as a tuple (depth, score, bound, move), or None if it isn't stored
+        """
+        self.probes += 1
+        i = (key % self.buckets) * 2
+        if self.keys[i] != key:
+            i += 1
+            if self.keys[i] != key:
+                return None
+        self.hits += 1
+        return self.depths[i], self.scores[i], self.bounds[i], self.moves[i]
+
+    def store(self, key, depth, score, bound, move=None):
+        """
+        It stores the result of a search. The move is the best one found (None if there isn't, as in a fail low)
+        """
+        self.stores += 1
+        i = (key % self.buckets) * 2
+        if self.keys[i] != key and self.ages[i] == self.age and depth < self.depths[i] and self.keys[i] != 0:
+            i += 1 # Keep the deeper search in the depth-preferred entry
+
+        if self.keys[i] == 0:
+            self.used += 1
+        elif self.keys[i] != key:
+            self.collisions += 1
+
+        if move is not None:
+            self.moves[i] = encode_move(move)
+        elif self.keys[i] != key:
+            self.moves[i] = 0
+
+        self.keys[i] = key
+        self.scores[i] = score
+        self.depths[i] = depth
+        self.bounds[i] = bound
+        self.ages[i] = self.age
+
+    def stats(self):
+        """
+        It returns a dict with the counters of the table, the hit rate and the fill rate
+        """
+        return {"probes": self.probes, "hits": self.hits, "cutoffs": self.cutoffs, "stores": self.stores,
+                "collisions": self.collisions, "used": self.used, "entries": 2 * self.buckets,
+                "hit_rate": self.hits / self.probes if self.probes else 0.0,
+                "fill_rate": self.used / (2 * self.buckets)}
+
+
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, size_mb=16, name=None):
+        """
+        Transposition table in shared memory, used at the same time by several processes (see ChessEngine.lazy_smp_root).
+        * Without name it creates the memory (and the process has to unlink it at the end), with name it uses the existing one
+        * Every entry is two 64 bits words: the data (score, depth, bound, age and move packed) and the key xor the data.
+        There aren't locks: if two processes write the same entry at the same time, the key doesn't match the data and the
+        entry is ignored
+        * The stats are the ones of this process
+        """
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 2**20) // (2 * SHARED_ENTRY_BYTES))
+        self.age = 0
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=2 * self.buckets * SHARED_ENTRY_BYTES)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast("Q")
+
+        self.used = 0
+        self.reset_stats()
+        if self.owner:
+            self.clear()
+
+    def __getstate__(self):
+        """
+        A shared table sent to another process is the same table there
+        """
+        return {"size_mb": self.size_mb, "age": self.age, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["size_mb"], state["name"])
+        self.age = state["age"]
+
+    def clear(self):
+        """
+        It empties the table (for all the processes) and resets the statistics
+        """
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+        self.used = 0
+        self.reset_stats()
+
+    def close(self):
+        """
+        It stops using the shared memory. The process that created it also frees it
+        """
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def probe(self, key):
+        self.probes += 1
+        words = self.words
+        i = (key % self.buckets) * 4
+        data = words[i + 1]
+        if words[i] ^ data != key:
+            i += 2
+            data = words[i + 1]
+            if words[i] ^ data != key:
+                return None
+        self.hits += 1
+        # data: score + 2**31 (32 bits), depth (8), bound (2), age (8), move (12)
+        return (data >> 32) & 0xff, (data & 0xffffffff) - 2**31, (data >> 40) & 0x3, (data >> 50) & 0xfff
+
+    def store(self, key, depth, score, bound, move=None):
+        self.stores += 1
+        words = self.words
+        i = (key % self.buckets) * 4
+        data = words[i + 1]
+        stored_key = words[i] ^ data
+        if stored_key != key and data != 0 and (data >> 42) & 0xff == self.age and depth < (data >> 32) & 0xff:
+            i += 2 # Keep the deeper search in the depth-preferred entry
+            data = words[i + 1]
+            stored_key = words[i] ^ data
+
+        if data == 0:
+            self.used += 1
+        elif stored_key != key:
+            self.collisions += 1
+
+        if move is not None:
+            move = encode_move(move)
+        elif stored_key == key:
+            move = (data >> 50) & 0xfff
+        else:
+            move = 0
+
+        data = (score + 2**31) | (max(depth, 0) << 32) | (bound << 40) | (self.age << 42) | (move << 50)
+        words[i + 1] = data
+        words[i] = key ^ data
+
+
+def merge_stats(stats_list):
+    """
+    It adds up the stats of several tables (one for every worker process)
+    """
+    merged = {}
+    for stats in stats_list:
+        for name, value in stats.items():
+            if name not in ("hit_rate", "fill_rate"):
+                merged[name] = merged.get(name, 0) + value
+    probes, entries = merged.get("probes", 0), merged.get("entries", 0)
+    merged["hit_rate"] = merged.get("hits", 0) / probes if probes else 0.0
+    merged["fill_rate"] = merged.get("used", 0) / entries if entries else 0.0
+    return merged
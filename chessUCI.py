@@ -0,0 +1,336 @@
+import sys
+import threading
+from time import time
+
+from chessRules import GameState, Move
+from chessEngine import ChessEngine
+from chessBook import OpeningBook
+from chessTablebase import Tablebases
+from chessStats import SearchStats
+from chessPerft import move_name
+
+# Options given to the GUI with the "uci" command: (name, type, default, min, max)
+UCI_OPTIONS = [("Hash", "spin", 16, 1, 1024),
+               ("SearchMode", "combo", "negamax", None, None),
+               ("Quiescence", "check", True, None, None),
+               ("NullMove", "check", True, None, None),
+               ("LMR", "check", True, None, None),
+               ("Futility", "check", True, None, None),
+               ("OwnBook", "check", False, None, None),
+               ("BookFile", "string", "", None, None),
+               ("TablebasePath", "string", "", None, None),
+               ("StatsFile", "string", "", None, None)]
+
+# Moves of the game used when there isn't a time control (movestogo)
+DEFAULT_MOVES_TO_GO = 30
+
+
+class UCIEngine():
+    def __init__(self, game_class=GameState, output=None):
+        """
+        Front-end of ChessEngine for the Universal Chess Interface, without the tkinter board: http://wbec-ridderkerk.nl/html/UCIProtocol.html
+        * It reads the commands with 'command' (see main) and writes the answers to 'output' (stdout by default)
+        * The search runs in a thread, so "stop" and "isready" are answered while it's searching
+        * Supported commands: uci, isready, ucinewgame, setoption, position, go, stop, quit
+        """
+        self.game_class = game_class
+        self.output = output or sys.stdout
+        self.game = game_class()
+        self.engine = ChessEngine(self.game, search_mode="negamax")
+
+        self.thread = None
+        self.search_start = 0
+
+        # With "go infinite" the "bestmove" is only sent after "stop" (see send_bestmove)
+        self.infinite = False
+        self.stopped = threading.Event()
+
+        # Opening book (see chessBook), used only with the option OwnBook
+        self.own_book = False
+
+    def send(self, line:str):
+        print(line, file=self.output, flush=True)
+
+    def command(self, line:str):
+        """
+        It runs one line of the protocol. It returns False after "quit"
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        name, args = tokens[0], tokens[1:]
+
+        if name == "uci":
+            self.send("id name Chess_AI")
+            self.send("id author Chess_AI")
+            for option, kind, default, minimum, maximum in UCI_OPTIONS:
+                if kind == "spin":
+                    self.send("option name {} type spin default {} min {} max {}".format(option, default, minimum, maximum))
+                elif kind == "combo":
+                    self.send("option name {} type combo default {} var minimax var negamax".format(option, default))
+                elif kind == "string":
+                    self.send("option name {} type string default {}".format(option, default or "<empty>"))
+                else:
+                    self.send("option name {} type check default {}".format(option, "true" if default else "false"))
+            self.send("uciok")
+        elif name == "isready":
+            self.send("readyok")
+        elif name == "ucinewgame":
+            self.stop()
+            self.engine.tt.clear()
+            self.game = self.game_class()
+        elif name == "setoption":
+            self.stop()
+            self.set_option(args)
+        elif name == "position":
+            self.stop()
+            self.set_position(args)
+        elif name == "go":
+            self.stop()
+            self.go(args)
+        elif name == "stop":
+            self.stop()
+        elif name == "quit":
+            self.stop()
+            self.engine.close()
+            self.close_stats()
+            return False
+        return True
+
+    def set_option(self, args:list):
+        """
+        setoption name <name> value <value>
+        """
+        if "name" not in args:
+            return
+        if "value" in args:
+            name = " ".join(args[args.index("name") + 1:args.index("value")])
+            value = " ".join(args[args.index("value") + 1:])
+        else:
+            name, value = " ".join(args[args.index("name") + 1:]), ""
+        checked = value.lower() == "true"
+
+        if name == "Hash":
+            try:
+                self.engine.tt_size_mb = max(1, int(value))
+            except ValueError:
+                return
+            self.engine.tt = type(self.engine.tt)(self.engine.tt_size_mb)
+        elif name == "SearchMode" and value in ("minimax", "negamax"):
+            self.engine.search_mode = value
+        elif name == "Quiescence":
+            self.engine.quiescence_search = checked
+        elif name == "NullMove":
+            self.engine.null_move_pruning = checked
+        elif name == "LMR":
+            self.engine.late_move_reductions = checked
+        elif name == "Futility":
+            self.engine.futility_pruning = checked
+        elif name == "OwnBook":
+            self.own_book = checked
+        elif name == "BookFile":
+            if self.engine.book is not None:
+                self.engine.book.close()
+                self.engine.book = None
+            if value and value != "<empty>":
+                try:
+                    self.engine.book = OpeningBook(value)
+                except OSError as error:
+                    self.send("info string " + str(error))
+        elif name == "TablebasePath":
+            if self.engine.tablebases is not None:
+                self.engine.tablebases.close()
+                self.engine.tablebases = None
+            self.engine.tablebase_path = None
+            if value and value != "<empty>":
+                try:
+                    self.engine.tablebases = Tablebases(value)
+                    self.engine.tablebase_path = value
+                except (OSError, ValueError) as error:
+                    self.send("info string " + str(error))
+        elif name == "StatsFile": # The stats of every search are appended to the file as lines of JSON (see chessStats)
+            self.close_stats()
+            if value and value != "<empty>":
+                try:
+                    self.engine.stats = SearchStats(open(value, "a"))
+                except OSError as error:
+                    self.send("info string " + str(error))
+
+    def close_stats(self):
+        if self.engine.stats is not None:
+            self.engine.stats.output.close()
+            self.engine.stats = None
+
+    def set_position(self, args:list):
+        """
+        position [startpos | fen <fen>] [moves <move1> ... <movei>]
+        The moves are in coordinates notation (see chessPerft.move_name), the promotions are always to a queen
+        """
+        moves = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            try:
+                game = self.game_class.from_fen(" ".join(args[1:moves]))
+            except ValueError as error:
+                self.send("info string " + str(error))
+                return
+        else:
+            game = self.game_class()
+
+        for name in args[moves + 1:]:
+            move = self.find_move(game, name)
+            if move is None:
+                self.send("info string illegal move " + name)
+                break
+            game.makeMove(move)
+        self.game = game
+
+    def find_move(self, game:GameState, name:str):
+        """
+        It returns the legal move with that name, or None
+        """
+        for move in game.legal_moves:
+            if move_name(move) == name[:4]:
+                return move
+        return None
+
+    def uci_move(self, move:Move):
+        """
+        The name of the move in the protocol, with the "q" of the promotions
+        """
+        name = move_name(move)
+        if move.piece[1] == "p" and move.y1 in (0, 7):
+            name += "q"
+        return name
+
+    def time_limit(self, options:dict):
+        """
+        Seconds of the search for the "go" options: movetime, or a part of the time left plus most of the increment,
+        never more than half of the time left
+        """
+        if "movetime" in options:
+            return options["movetime"] / 1000
+        time_left = options.get("wtime" if self.game.isWhiteTurn else "btime")
+        if time_left is None:
+            return None
+        increment = options.get("winc" if self.game.isWhiteTurn else "binc", 0)
+        budget = time_left / options.get("movestogo", DEFAULT_MOVES_TO_GO) + 0.8 * increment
+        return max(0.01, min(budget, time_left / 2) / 1000)
+
+    def go(self, args:list):
+        """
+        go [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>] [movestogo <n>] [movetime <ms>] [depth <n>] [nodes <n>] [infinite]
+        """
+        options = {}
+        for i, arg in enumerate(args[:-1]):
+            if arg in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"):
+                try:
+                    options[arg] = int(args[i + 1])
+                except ValueError:
+                    pass
+
+        self.infinite = "infinite" in args
+        self.stopped.clear()
+
+        if not self.game.legal_moves:
+            self.answer(None)
+            return
+
+        if self.own_book:
+            move = self.engine.book_move(self.game)
+            if move is not None:
+                self.send("info string book move")
+                self.answer(move)
+                return
+
+        move = self.engine.tablebase_move(self.game)
+        if move is not None:
+            self.send("info string tablebase move")
+            self.answer(move)
+            return
+
+        time_limit = None if self.infinite else self.time_limit(options)
+        depth = options.get("depth", 64)
+        node_limit = options.get("nodes")
+        self.thread = threading.Thread(target=self.search, args=(self.game, depth, time_limit, node_limit))
+        self.thread.start()
+
+    def search(self, game:GameState, depth:int, time_limit, node_limit):
+        self.search_start = time()
+        move, _, _, _ = self.engine.search(game, depth, time_limit, node_limit, info=self.info)
+        self.send_bestmove(move)
+
+    def answer(self, move:Move):
+        """
+        It answers "go" without searching (a book or tablebase move, or None without legal moves). With "go infinite" the
+        "bestmove" waits for "stop" in a thread, so the commands are still read
+        """
+        if self.infinite:
+            self.thread = threading.Thread(target=self.send_bestmove, args=(move,))
+            self.thread.start()
+        else:
+            self.send_bestmove(move)
+
+    def send_bestmove(self, move:Move):
+        """
+        It sends the "bestmove" (0000 without a move). With "go infinite" the protocol doesn't allow sending it before
+        "stop", even if the search has finished (a mate found, or the maximum depth)
+        """
+        if self.infinite:
+            self.stopped.wait()
+        self.send("bestmove " + (self.uci_move(move) if move is not None else "0000"))
+
+    def stop(self):
+        """
+        It ends the search (if there is one) and waits for its "bestmove"
+        """
+        self.stopped.set()
+        while self.thread is not None and self.thread.is_alive():
+            self.engine.deadline = 0
+            self.thread.join(0.01)
+        self.thread = None
+
+    def info(self, depth:int, evaluation:float, move:Move, seconds:float):
+        """
+        It sends the "info" line of a depth of the search. The score is from the side to move
+        """
+        engine = self.engine
+        score = evaluation if self.game.isWhiteTurn else -evaluation
+        if abs(score) > engine.MATE_THRESHOLD:
+            plies = engine.MATE_SCORE - abs(score) + 1 # The root move isn't counted in the score
+            score = "mate " + str((plies + 1) // 2 if score > 0 else -((plies + 1) // 2))
+        else:
+            score = "cp " + str(int(score))
+        elapsed = time() - self.search_start
+        nps = int(engine.nodes / elapsed) if elapsed else 0
+        self.send("info depth {} score {} nodes {} nps {} time {} pv {}".format(depth, score, engine.nodes, nps, int(elapsed * 1000),
+                                                                              " ".join(self.principal_variation(move, depth))))
+
+    def principal_variation(self, move:Move, depth:int):
+        """
+        The names of the best line: the best move and then the hash moves of the transposition table
+        """
+        game = self.game_class.from_fen(self.game.to_fen())
+        pv = []
+        seen = set()
+        while move is not None and len(pv) < depth and game.zobrist_key not in seen:
+            seen.add(game.zobrist_key)
+            pv.append(self.uci_move(move))
+            game.makeMove(move)
+            entry = self.engine.tt.probe(game.zobrist_key)
+            move = None
+            if entry is not None and entry[3]:
+                move = Move.unpack(entry[3], game)
+                if move not in game.legal_moves:
+                    move = None
+        return pv
+
+
+def main():
+    uci = UCIEngine()
+    for line in sys.stdin:
+        if not uci.command(line):
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ from chessRules import GameState, Move
 from chessEval import GameEval
 
 from chessEngine import ChessEngine
+from chessBook import OpeningBook
+from chessTablebase import Tablebases
 
 import os
 from copy import deepcopy
-from math import log
 from time import sleep
 
 class Board(tk.Canvas):
@@ -43,6 +44,7 @@ class Board(tk.Canvas):
         self.engine = False
         self.engine_UI = []
         self.engine_depth = 1
+        self.engine_time = 5 # Seconds per move when engine_depth is 1
         self.engine_player = False
         self.engine_plays = False
         if "engine" in kwargs:
@@ -51,6 +53,20 @@ class Board(tk.Canvas):
             if "engine_depth" in kwargs:
                 self.engine_depth = kwargs.pop("engine_depth")
 
+            if "engine_time" in kwargs:
+                self.engine_time = kwargs.pop("engine_time")
+
+            if "book" in kwargs: # Opening book file (see chessBook)
+                book = kwargs.pop("book")
+                if book:
+                    self.gameEngine.book = OpeningBook(book)
+
+            if "tablebases" in kwargs: # Directory of the endgame tables (see chessTablebase)
+                tablebases = kwargs.pop("tablebases")
+                if tablebases:
+                    self.gameEngine.tablebase_path = tablebases
+                    self.gameEngine.tablebases = Tablebases(tablebases)
+
             if "engine_player" in kwargs:
                 self.engine_player = kwargs.pop("engine_player")
                 if self.engine_player == "White":
@@ -405,14 +421,8 @@ class Board(tk.Canvas):
                     self.calc_next_best_move = False
                     white = True if len(self.gameState.move_log) % 2 == 0 else False
                     if self.engine_depth == 1:
-                        try:
-                            depth = round(log(2**14, len(self.gameState.legal_moves))) if round(log(2**14, len(self.gameState.legal_moves)))<=4 else 4
-                            print(depth)
-                            self.gameEngine.minimax_root(depth, self.gameState)
-                        except ZeroDivisionError:
-                            depth = 4
-                            print(str(depth) + ".")
-                            self.gameEngine.minimax_root(depth, self.gameState)
+                        # Iterative deepening: the same time for every move, whatever the depth reached
+                        self.gameEngine.minimax_root(64, self.gameState, time_limit=self.engine_time)
                     else:
                         self.gameEngine.minimax_root(self.engine_depth, self.gameState)
 
@@ -477,6 +487,8 @@ class Chess(tk.Frame):
         thermometer_needed = False
         engine_needed = False
         engine_depth = 0
+        book = None
+        tablebases = None
         self.engine_player = None
 
         if "thermometer" in kwargs:
@@ -488,6 +500,10 @@ class Chess(tk.Frame):
             engine_needed = kwargs.pop("engine")
         if "engine_depth" in kwargs:
             engine_depth = kwargs.pop("engine_depth")
+        if "book" in kwargs:
+            book = kwargs.pop("book")
+        if "tablebases" in kwargs:
+            tablebases = kwargs.pop("tablebases")
         if "engine_player" in kwargs:
             if kwargs["engine_player"] == "White":
                 self.engine_player = kwargs.pop("engine_player")
@@ -512,7 +528,8 @@ class Chess(tk.Frame):
             self.engine.pack(side="bottom", anchor="center")
 
         #Initialise the board
-        self.board = Board(self, self.parent, thermometer=self.thermometer, engine=self.engine, engine_depth=int(engine_depth), engine_player=self.engine_player)
+        self.board = Board(self, self.parent, thermometer=self.thermometer, engine=self.engine, engine_depth=int(engine_depth), engine_player=self.engine_player, book=book,
+                           tablebases=tablebases)
         self.board.pack(fill="both", expand=True, side="left", anchor="e")
 
         if thermometer_needed:
@@ -565,7 +582,12 @@ if __name__ == '__main__':
     root.title("Chess GUI")
 
     #board = Chess(root)
-    board = Chess(root, thermometer=thermometer.get(), engine=engine.get(), engine_player=engine_player.get(), engine_depth=int(engine_depth.get()))
+    # The opening book is used if there's one next to this file (see chessBook)
+    book = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+    # And the endgame tables of the directory tablebases (see chessTablebase)
+    tablebases = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+    board = Chess(root, thermometer=thermometer.get(), engine=engine.get(), engine_player=engine_player.get(), engine_depth=int(engine_depth.get()),
+                  book=book if os.path.exists(book) else None, tablebases=tablebases if os.path.isdir(tablebases) else None)
     board.pack(fill="both", expand=True)
 
     root.geometry(f"{str(64*8+32)}x{str(64*8+32)}")
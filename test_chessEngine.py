@@ -0,0 +1,114 @@
+import multiprocessing
+import unittest
+
+import chessEngine
+from chessBitboard import BitboardGameState
+from chessEngine import ChessEngine
+from chessPerft import REFERENCE_POSITIONS
+from chessRules import GameState
+from chessStats import SearchStats
+
+# Position where the null move fails high with the window below (see ChessEngine.pruning)
+ITALIAN = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"
+
+
+class FloatBoundsTest(unittest.TestCase):
+    """
+    The bounds of the Young Brothers Wait window are floats of shared memory, and the transposition table stores integers
+    """
+    def test_minimax(self):
+        game = BitboardGameState.from_fen(ITALIAN)
+        engine = ChessEngine(game)
+        score = engine.minimax(4, game.copy(), -30.0, -29.0, False)
+        self.assertIsInstance(score, int)
+
+    def test_negamax(self):
+        game = BitboardGameState.from_fen(ITALIAN)
+        engine = ChessEngine(game)
+        score = engine.negamax(4, game.copy(), 29.0, 30.0, -1)
+        self.assertIsInstance(score, int)
+
+    def test_worker_search_split(self):
+        split_id = 1
+        window = multiprocessing.Array("d", [split_id, -30.0, -29.0], lock=False)
+        chessEngine.worker_init(BitboardGameState, 1, window)
+        game = BitboardGameState.from_fen("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 2 3")
+        move = next(move for move in game.legal_moves if move.piece == "wK" and move.enroc)
+        options = ChessEngine(game).search_options()
+        score = chessEngine.worker_search_split(1, split_id, game.get_position(), move, 5, -float("inf"), float("inf"), options)[0]
+        self.assertIsInstance(score, int)
+
+
+class YoungBrothersWaitTest(unittest.TestCase):
+    """
+    Without the selective pruning, the Young Brothers Wait search gets the evaluation of the serial search (with it, the
+    evaluations can be different, see ChessEngine.ybwc_root)
+    """
+    def test_same_evaluation(self):
+        for fen in (ITALIAN, "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 2 3"):
+            evaluations = []
+            for parallel in (True, False):
+                game = BitboardGameState.from_fen(fen)
+                engine = ChessEngine(game, workers=2, parallel="ybwc")
+                engine.null_move_pruning = engine.late_move_reductions = engine.futility_pruning = False
+                if parallel:
+                    evaluations.append(engine.ybwc_root(4, game)[1])
+                else:
+                    evaluations.append(engine.minimax(4, game.copy(), -float("inf"), float("inf"), game.isWhiteTurn))
+                engine.close()
+            self.assertEqual(evaluations[0], evaluations[1], fen)
+
+
+class SearchOptionsTest(unittest.TestCase):
+    """
+    The switches of the search changed after the pool has started are used by the worker processes
+    """
+    def test_changed_switches(self):
+        for parallel in ("root", "ybwc", "lazy_smp"):
+            game = GameState.from_fen(ITALIAN)
+            engine = ChessEngine(game, workers=2, parallel=parallel)
+            engine.stats = SearchStats()
+            engine.minimax_root(3, game).result()
+            self.assertGreater(engine.search_stats["q_nodes"], 0, parallel)
+            engine.quiescence_search = False
+            engine.minimax_root(3, game).result()
+            engine.close()
+            self.assertEqual(engine.search_stats["q_nodes"], 0, parallel)
+
+
+class NegamaxTest(unittest.TestCase):
+    """
+    Without the node limit of the quiescence search and without the selective pruning, negamax gets the evaluations of
+    minimax (see ChessEngine.quiescence)
+    """
+    def test_same_evaluation(self):
+        for name, fen, _ in REFERENCE_POSITIONS:
+            evaluations = []
+            for search_mode in ("minimax", "negamax"):
+                game = GameState.from_fen(fen)
+                engine = ChessEngine(game, search_mode=search_mode)
+                engine.null_move_pruning = engine.late_move_reductions = engine.futility_pruning = False
+                engine.q_node_limit = float("inf")
+                evaluations.append(engine.search(game, 3, info=lambda *args: None)[1])
+            self.assertEqual(evaluations[0], evaluations[1], name)
+
+
+class SearchStatsTest(unittest.TestCase):
+    """
+    Every mode of minimax_root keeps the summary of its search, with the nodes of the worker processes
+    """
+    def test_all_modes(self):
+        for parallel, search_mode in (("root", "minimax"), ("ybwc", "minimax"), ("lazy_smp", "minimax"), ("root", "negamax")):
+            game = GameState.from_fen(ITALIAN)
+            engine = ChessEngine(game, workers=2, parallel=parallel, search_mode=search_mode)
+            engine.stats = SearchStats()
+            infos = []
+            engine.minimax_root(3, game, info=lambda *args: infos.append(args)).result()
+            engine.close()
+            self.assertGreater(engine.search_stats["nodes"], 0, parallel)
+            self.assertEqual(engine.search_stats["evaluation"], engine.pos_evaluation, parallel)
+            self.assertEqual(infos[-1][1], engine.pos_evaluation, parallel)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from chessBitboard import BitboardGameState
+from chessEval import GameEval
+from chessPerft import REFERENCE_POSITIONS
+from chessRules import GameState
+
+# Random lines played from every reference position, and their plies
+LINES = 4
+PLIES = 40
+
+
+def state(game:GameState):
+    """
+    What undoing a move has to restore: the position, its Zobrist key and the running scores of the evaluation
+    """
+    return game.to_fen(), game.zobrist_key, game.material_score, game.position_score
+
+
+class IncrementalEvalTest(unittest.TestCase):
+    """
+    Along random lines with null moves, the running scores of the GameState give the evaluation of the full recalculation
+    (GameEval.check_incremental), and undoing the moves restores them
+    """
+    def test_random_lines(self):
+        rng = random.Random(1)
+        for game_class in (GameState, BitboardGameState):
+            for name, fen, _ in REFERENCE_POSITIONS:
+                for _ in range(LINES):
+                    game = game_class.from_fen(fen)
+                    game_eval = GameEval(game)
+                    game_eval.check_incremental = True
+                    states = []
+                    nulls = []
+                    for _ in range(PLIES):
+                        game_eval.eval_pos(game)
+                        self.assertEqual(game.zobrist_key, game.calc_zobrist_key(), name)
+                        if game.theresCheckMate or game.theresDraw:
+                            break
+                        states.append(state(game))
+                        null = not game.theresCheck and rng.random() < 0.2
+                        nulls.append(null)
+                        if null:
+                            game.makeNullMove()
+                        else:
+                            game.makeMove(rng.choice(game.legal_moves))
+
+                    while nulls:
+                        if nulls.pop():
+                            game.undoNullMove()
+                        else:
+                            game.undoMove()
+                        self.assertEqual(state(game), states.pop(), name)
+                        game_eval.eval_pos(game)
+
+
+if __name__ == "__main__":
+    unittest.main()
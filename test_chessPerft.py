@@ -0,0 +1,38 @@
+import unittest
+
+from chessBitboard import BitboardGameState
+from chessPerft import REFERENCE_POSITIONS, perft, divide
+from chessRules import GameState
+
+# Deepest perft of the suite, with more the tests would take minutes
+MAX_DEPTH = 3
+
+
+class PerftTest(unittest.TestCase):
+    """
+    The counts of the legal moves of the reference positions (see chessPerft.REFERENCE_POSITIONS), for both GameStates
+    """
+    def check_suite(self, game_class, hashing=False):
+        for name, fen, counts in REFERENCE_POSITIONS:
+            game = game_class.from_fen(fen)
+            for depth, expected in enumerate(counts[:MAX_DEPTH], 1):
+                self.assertEqual(perft(game, depth, {} if hashing else None), expected, "{} depth {}".format(name, depth))
+            self.assertEqual(game.to_fen(), fen, name)
+
+    def test_mailbox(self):
+        self.check_suite(GameState)
+
+    def test_bitboard(self):
+        self.check_suite(BitboardGameState)
+
+    def test_hashing(self):
+        self.check_suite(BitboardGameState, hashing=True)
+
+    def test_divide(self):
+        name, fen, counts = REFERENCE_POSITIONS[1]
+        game = GameState.from_fen(fen)
+        self.assertEqual(sum(divide(game, 2).values()), counts[1], name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from chessBitboard import BitboardGameState
+from chessPerft import REFERENCE_POSITIONS, move_name
+from chessRules import GameState
+
+# Random games played from every reference position, and their plies
+GAMES = 4
+PLIES = 40
+
+
+def move_set(game:GameState):
+    """
+    The legal moves of the game by their squares, with the 'en passant' and the castle flags
+    """
+    return sorted((move_name(move), bool(move.paso), move.enroc or "") for move in game.legal_moves)
+
+
+class LegalMovesTest(unittest.TestCase):
+    """
+    calc_legal_moves, calc_legal_moves_reference and BitboardGameState give the same legal moves along random games from the
+    perft positions, and undoing the games gets back the first position
+    """
+    def test_random_games(self):
+        rng = random.Random(1)
+        for name, fen, _ in REFERENCE_POSITIONS:
+            for _ in range(GAMES):
+                game = GameState.from_fen(fen)
+                bitboard = BitboardGameState.from_fen(fen)
+                for _ in range(PLIES):
+                    reference = game.copy()
+                    reference.calc_legal_moves_reference()
+                    position = name + ": " + game.to_fen()
+                    self.assertEqual(move_set(game), move_set(reference), position)
+                    self.assertEqual(move_set(game), move_set(bitboard), position)
+                    self.assertEqual((game.theresCheck, game.theresCheckMate, game.theresDraw),
+                                     (reference.theresCheck, reference.theresCheckMate, reference.theresDraw), position)
+                    self.assertEqual((game.theresCheck, game.theresCheckMate, game.theresDraw),
+                                     (bitboard.theresCheck, bitboard.theresCheckMate, bitboard.theresDraw), position)
+                    if game.theresCheckMate or game.theresDraw:
+                        break
+
+                    move = rng.choice(game.legal_moves)
+                    game.makeMove(move)
+                    bitboard.makeMove(bitboard.legal_moves[bitboard.legal_moves.index(move)])
+                    self.assertEqual(game.to_fen(), bitboard.to_fen(), position)
+                    self.assertEqual(game.zobrist_key, bitboard.zobrist_key, position)
+
+                for _ in range(len(game.move_log)):
+                    game.undoMove()
+                    bitboard.undoMove()
+                self.assertEqual(game.to_fen(), fen, name)
+                self.assertEqual(bitboard.to_fen(), fen, name)
+                self.assertEqual(move_set(game), move_set(bitboard), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import io
+import unittest
+
+from chessUCI import UCIEngine
+
+# White mates in one (Ra8#)
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+class InfiniteTest(unittest.TestCase):
+    """
+    With "go infinite" the "bestmove" isn't sent until "stop", even if the search has already finished
+    """
+    def test_bestmove_after_stop(self):
+        output = io.StringIO()
+        uci = UCIEngine(output=output)
+        uci.command("position fen " + MATE_IN_ONE)
+        uci.command("go infinite")
+        # The search stops at the depth of the mate, and then waits
+        uci.thread.join(2)
+        self.assertIn("score mate 1", output.getvalue())
+        self.assertNotIn("bestmove", output.getvalue())
+        uci.command("stop")
+        self.assertIn("bestmove a1a8", output.getvalue())
+        uci.command("quit")
+
+    def test_bestmove_without_infinite(self):
+        output = io.StringIO()
+        uci = UCIEngine(output=output)
+        uci.command("position fen " + MATE_IN_ONE)
+        uci.command("go depth 2")
+        uci.thread.join()
+        self.assertIn("bestmove a1a8", output.getvalue())
+        uci.command("quit")
+
+
+if __name__ == "__main__":
+    unittest.main()